@@ -0,0 +1,115 @@
+# bench/bench_routing.py
+"""
+Бенчмарк маршрутизации: сколько стоит апдейт со свободным текстом от игрока.
+
+Сравнивается текущая схема (фильтр админа на уровне роутера + хендлеры по
+состояниям FSM) со старой, где админский роутер заканчивался хендлером без
+фильтров, читавшим state.get_data() на каждое сообщение.
+
+Запуск: python -m bench.bench_routing [кол-во апдейтов]
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+# Токен и админы нужны только для импорта модулей бота, в сеть бенчмарк не ходит
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+from aiogram import Dispatcher, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Update
+
+from bot.create_bot import bot, config
+from bot.filters.admin import AdminFilter
+from bot.handlers.admin_handlers import admin_router
+from bot.handlers.user_handlers import user_router
+
+PLAYER_ID = 10_000
+TEXTS = ["привет", "а где задание?", "42", "не понимаю", "ок"]
+
+
+def make_update(update_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(datetime.now().timestamp()),
+            "chat": {"id": PLAYER_ID, "type": "private"},
+            "from": {"id": PLAYER_ID, "is_bot": False, "first_name": "Игрок"},
+            "text": TEXTS[update_id % len(TEXTS)],
+        },
+    })
+
+
+def copy_router(source: Router, name: str, with_root_filters: bool = True) -> Router:
+    """Копия роутера с теми же хендлерами (роутер нельзя подключить дважды)"""
+    router = Router(name=name)
+    for event_name in ("message", "callback_query"):
+        source_observer = source.observers[event_name]
+        target_observer = router.observers[event_name]
+        for handler in source_observer.handlers:
+            filters = [f.magic or f.callback for f in handler.filters or []]
+            target_observer.register(handler.callback, *filters, flags=handler.flags)
+        if with_root_filters:
+            for root_filter in source_observer._handler.filters or []:
+                target_observer.filter(root_filter.magic or root_filter.callback)
+    return router
+
+
+async def legacy_handle_edit_value(message, state: FSMContext):
+    """Поведение старого хендлера-ловушки до выхода по пустым данным"""
+    data = await state.get_data()
+    if "edit_task_id" not in data:
+        return
+
+
+def build_current() -> Dispatcher:
+    admin = copy_router(admin_router, "admin")
+    admin_filter = AdminFilter(config.ADMIN_IDS)
+    admin.message.filter(admin_filter)
+    admin.callback_query.filter(admin_filter)
+
+    dp = Dispatcher()
+    dp.include_router(copy_router(user_router, "user"))
+    dp.include_router(admin)
+    return dp
+
+
+def build_legacy() -> Dispatcher:
+    admin = copy_router(admin_router, "admin_legacy", with_root_filters=False)
+    admin.message.register(legacy_handle_edit_value)
+
+    dp = Dispatcher()
+    dp.include_router(copy_router(user_router, "user_legacy"))
+    dp.include_router(admin)
+    return dp
+
+
+async def measure(dp: Dispatcher, updates: list) -> float:
+    """Среднее время обработки одного апдейта в микросекундах"""
+    for update in updates[:200]:
+        await dp.feed_update(bot, update)
+
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / len(updates) * 1_000_000
+
+
+async def main(count: int) -> None:
+    updates = [make_update(i) for i in range(1, count + 1)]
+
+    legacy = await measure(build_legacy(), updates)
+    current = await measure(build_current(), updates)
+
+    print(f"Апдейтов: {count}")
+    print(f"Старая схема:   {legacy:8.1f} мкс/апдейт")
+    print(f"Текущая схема:  {current:8.1f} мкс/апдейт")
+    print(f"Ускорение:      {legacy / current:8.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000))
@@ -1,5 +1,13 @@
 from aiogram import Bot
 from bot.utils.config import load_config
+from bot.utils.telegram_session import TelegramSession
 
 config = load_config()
-bot = Bot(token=config.BOT_TOKEN)
\ No newline at end of file
+# Все исходящие запросы идут через общий пул с повторами при 429/5xx
+session = TelegramSession(
+    pool_size=config.TELEGRAM_POOL_SIZE,
+    max_concurrency=config.TELEGRAM_MAX_CONCURRENCY,
+    max_retries=config.TELEGRAM_MAX_RETRIES,
+    max_retry_after=config.TELEGRAM_MAX_RETRY_AFTER
+)
+bot = Bot(token=config.BOT_TOKEN, session=session)
\ No newline at end of file
@@ -0,0 +1,16 @@
+# bot/filters/admin.py
+from typing import Iterable, Union
+
+from aiogram.filters import BaseFilter
+from aiogram.types import CallbackQuery, Message
+
+
+class AdminFilter(BaseFilter):
+    """Пропускает только апдейты от администраторов (проверка по множеству, O(1))"""
+
+    def __init__(self, admin_ids: Iterable[int]):
+        self.admin_ids = frozenset(admin_ids)
+
+    async def __call__(self, event: Union[Message, CallbackQuery]) -> bool:
+        user = event.from_user
+        return user is not None and user.id in self.admin_ids
@@ -1,18 +1,37 @@
 # bot/handlers/admin_handlers.py
 from aiogram import Router, types, F
-from aiogram.filters import Command, CommandObject
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
+import html
 import logging
+from functools import lru_cache
+import os
+from datetime import datetime, timedelta
 from ..create_bot import bot
 
 from bot.services.task_service import TaskService
 from bot.services.user_service import UserService
+from bot.services.notifier import BulkSender
+from bot.services.scheduler import RoundScheduler, utcnow
+from bot.services.export_service import ExportService
+from bot.services.backup import BackupService
+from bot.services.task_purge import TaskPurger
+from bot.services.event_service import EventService
+from bot.utils.render import render_task_edit, edit_task_keyboard
+from bot.utils.telegram_session import TelegramSession
+from bot.models.database import MATCH_START, MATCH_END
 
 logger = logging.getLogger(__name__)
+# Фильтр администраторов вешается на весь роутер при запуске (см. main.py),
+# поэтому сообщения игроков отсекаются до проверки отдельных хендлеров
 admin_router = Router()
 
+CANCEL_WORDS = ["отмена", "cancel", "стоп", "stop", "/cancel", "🚫 Отмена действия"]
+FIND_PAGE_SIZE = 5
+
+@lru_cache(maxsize=None)
 def get_admin_keyboard():
     builder = ReplyKeyboardBuilder()
     builder.add(types.KeyboardButton(text="📝 Добавить задание"))
@@ -56,6 +75,15 @@ async def cmd_admin(message: types.Message, admin_ids: list):
         parse_mode="HTML"
     )
 
+@admin_router.message(StateFilter(CreateTask, EditTask), F.text.in_(CANCEL_WORDS))
+async def cancel_in_state(message: types.Message, state: FSMContext):
+    """Отмена создания или редактирования задания"""
+    await state.clear()
+    await message.answer(
+        "✅ Текущее действие отменено.",
+        reply_markup=get_admin_keyboard()
+    )
+
 @admin_router.message(F.text == "📝 Добавить задание")
 @admin_router.message(Command("add_task"))
 async def cmd_add_task(message: types.Message, state: FSMContext, admin_ids: list):
@@ -141,6 +169,76 @@ async def cmd_list_tasks(message: types.Message, task_service: TaskService, admi
     
     await message.answer(tasks_text, parse_mode="HTML")
 
+def format_search_page(query: str, rows: list, total: int, page: int) -> str:
+    """Страница результатов поиска заданий; совпадения выделены жирным"""
+    pages = (total + FIND_PAGE_SIZE - 1) // FIND_PAGE_SIZE
+    text = f"🔎 <b>Поиск:</b> {html.escape(query)}\nНайдено: {total}, страница {page + 1}/{pages}\n\n"
+    for task_id, title, is_active, snippet in rows:
+        status = "✅" if is_active else "❌"
+        snippet = html.escape(snippet).replace(MATCH_START, "<b>").replace(MATCH_END, "</b>")
+        text += (
+            f"🆔 {task_id} {status} <b>{html.escape(title)}</b>\n"
+            f"📖 {snippet}\n"
+            f"📋 <code>/edit_task {task_id}</code>\n\n"
+        )
+    return text
+
+def search_keyboard(page: int, total: int):
+    pages = (total + FIND_PAGE_SIZE - 1) // FIND_PAGE_SIZE
+    if pages <= 1:
+        return None
+    builder = InlineKeyboardBuilder()
+    if page > 0:
+        builder.add(types.InlineKeyboardButton(text="◀️ Назад", callback_data=f"find_page:{page - 1}"))
+    if page < pages - 1:
+        builder.add(types.InlineKeyboardButton(text="Вперед ▶️", callback_data=f"find_page:{page + 1}"))
+    return builder.as_markup()
+
+@admin_router.message(Command("find_task"))
+async def cmd_find_task(message: types.Message, command: CommandObject, state: FSMContext,
+                        task_service: TaskService, admin_ids: list):
+    """Полнотекстовый поиск заданий по названию и описанию"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer("❌ Использование: /find_task слова для поиска")
+        return
+    
+    rows, total = await task_service.search_tasks(query, FIND_PAGE_SIZE, 0)
+    if not total:
+        await message.answer(f"📭 По запросу «{html.escape(query)}» ничего не найдено.")
+        return
+    
+    # Запрос нужен для листания страниц, в callback_data он может не поместиться
+    await state.update_data(find_query=query)
+    await message.answer(
+        format_search_page(query, rows, total, 0),
+        reply_markup=search_keyboard(0, total),
+        parse_mode="HTML"
+    )
+
+@admin_router.callback_query(F.data.startswith("find_page:"))
+async def find_task_page(callback: types.CallbackQuery, state: FSMContext, task_service: TaskService):
+    query = (await state.get_data()).get("find_query")
+    if not query:
+        await callback.answer("Поиск устарел, повторите /find_task", show_alert=True)
+        return
+    
+    page = int(callback.data.split(":", 1)[1])
+    rows, total = await task_service.search_tasks(query, FIND_PAGE_SIZE, page * FIND_PAGE_SIZE)
+    if not rows:
+        await callback.answer("Страница пуста")
+        return
+    
+    await callback.message.edit_text(
+        format_search_page(query, rows, total, page),
+        reply_markup=search_keyboard(page, total),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
 @admin_router.message(F.text == "👥 Управление пользователями")
 @admin_router.message(Command("list_users"))
 async def cmd_list_users(message: types.Message, user_service: UserService, admin_ids: list):
@@ -198,6 +296,7 @@ async def cmd_allow_task(message: types.Message, command: CommandObject, user_se
         await user_service.update_user_task_permission(user.telegram_id, True)
         await user_service.set_user_current_task(user.telegram_id, None)
         await bot.send_message(
+            user.telegram_id,
             f"✅ <b>Вам разрешено получить новое задание!</b>\n\n"
             f"Теперь вы можете использовать команду /task для получения следущего задания.",
             parse_mode="HTML"
@@ -212,6 +311,430 @@ async def cmd_allow_task(message: types.Message, command: CommandObject, user_se
         logger.error(f"Error in allow_task: {e}")
         await message.answer(f"❌ Ошибка: {e}")
 
+@admin_router.message(Command("open_round"))
+async def cmd_open_round(message: types.Message, command: CommandObject, user_service: UserService,
+                         notifier: BulkSender, admin_ids: list):
+    """Открыть новый раунд сразу для всех подходящих пользователей"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    min_score = None
+    only_solved = False
+    for arg in (command.args or '').split():
+        if arg.lower() == 'solved':
+            only_solved = True
+        elif arg.isdigit():
+            min_score = int(arg)
+        else:
+            await message.answer(
+                "❌ <b>Использование:</b> /open_round [min_score] [solved]\n\n"
+                "Например:\n"
+                "<code>/open_round</code> - всем пользователям\n"
+                "<code>/open_round 30</code> - пользователям с 30+ баллами\n"
+                "<code>/open_round solved</code> - только решившим текущее задание",
+                parse_mode="HTML"
+            )
+            return
+    
+    telegram_ids = await user_service.open_round(min_score, only_solved)
+    
+    # Уведомления уходят в фоне с ограничением скорости
+    queued = notifier.send_many(
+        telegram_ids,
+        "✅ <b>Открыт новый раунд!</b>\n\n"
+        "Используйте команду /task для получения следующего задания.",
+        parse_mode="HTML"
+    )
+    
+    await message.answer(
+        f"✅ <b>Раунд открыт!</b>\n\n"
+        f"👥 Пользователей: {len(telegram_ids)}\n"
+        f"📨 Уведомлений в очереди: {queued}",
+        parse_mode="HTML"
+    )
+
+def parse_round_args(args: list, utc_offset: int):
+    """Разобрать время старта и фильтры раунда.
+
+    Время: +минуты, ЧЧ:ММ (ближайшее) или ГГГГ-ММ-ДД ЧЧ:ММ в часовом поясе UTC+utc_offset.
+    Возвращает (starts_at в UTC, min_score, only_solved).
+    """
+    if not args:
+        raise ValueError("Не указано время")
+    
+    offset = timedelta(hours=utc_offset)
+    now = utcnow()
+    
+    if args[0].startswith('+'):
+        starts_at = now + timedelta(minutes=int(args[0][1:]))
+        rest = args[1:]
+    elif '-' in args[0]:
+        local = datetime.strptime(f"{args[0]} {args[1]}", "%Y-%m-%d %H:%M")
+        starts_at = local - offset
+        rest = args[2:]
+    else:
+        time_of_day = datetime.strptime(args[0], "%H:%M").time()
+        local = datetime.combine((now + offset).date(), time_of_day)
+        starts_at = local - offset
+        if starts_at <= now:
+            starts_at += timedelta(days=1)
+        rest = args[1:]
+    
+    min_score = None
+    only_solved = False
+    for arg in rest:
+        if arg.lower() == 'solved':
+            only_solved = True
+        else:
+            min_score = int(arg)
+    
+    return starts_at, min_score, only_solved
+
+@admin_router.message(Command("schedule_round"))
+async def cmd_schedule_round(message: types.Message, command: CommandObject, scheduler: RoundScheduler,
+                             utc_offset: int, admin_ids: list):
+    """Запланировать раунд на заданное время"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    try:
+        starts_at, min_score, only_solved = parse_round_args((command.args or '').split(), utc_offset)
+    except (ValueError, IndexError):
+        await message.answer(
+            "❌ <b>Использование:</b> /schedule_round время [min_score] [solved]\n\n"
+            "Например:\n"
+            "<code>/schedule_round +15</code> - через 15 минут\n"
+            "<code>/schedule_round 14:30</code>\n"
+            "<code>/schedule_round 2025-04-20 14:30 solved</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    schedule = await scheduler.schedule_round(starts_at, min_score, only_solved)
+    local_time = (starts_at + timedelta(hours=utc_offset)).strftime('%Y-%m-%d %H:%M')
+    await message.answer(
+        f"⏰ <b>Раунд запланирован!</b>\n\n"
+        f"🆔 ID: {schedule.id}\n"
+        f"🕐 Старт: {local_time} (UTC{utc_offset:+d})\n"
+        f"Отменить: <code>/cancel_round {schedule.id}</code>",
+        parse_mode="HTML"
+    )
+
+@admin_router.message(Command("schedules"))
+async def cmd_schedules(message: types.Message, task_service: TaskService, utc_offset: int, admin_ids: list):
+    """Список запланированных раундов"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    schedules = await task_service.db.get_pending_schedules()
+    if not schedules:
+        await message.answer("📭 Нет запланированных раундов.")
+        return
+    
+    text = "⏰ <b>Запланированные раунды:</b>\n\n"
+    for schedule in schedules:
+        local_time = (schedule.starts_at + timedelta(hours=utc_offset)).strftime('%Y-%m-%d %H:%M')
+        filters = []
+        if schedule.min_score is not None:
+            filters.append(f"от {schedule.min_score} баллов")
+        if schedule.only_solved:
+            filters.append("только решившие")
+        text += (
+            f"🆔 {schedule.id} - {local_time} ({schedule.status})\n"
+            f"👥 {', '.join(filters) or 'все пользователи'}\n"
+            f"❌ Отменить: <code>/cancel_round {schedule.id}</code>\n"
+            f"{'─' * 30}\n"
+        )
+    await message.answer(text, parse_mode="HTML")
+
+@admin_router.message(Command("cancel_round"))
+async def cmd_cancel_round(message: types.Message, command: CommandObject, scheduler: RoundScheduler,
+                           admin_ids: list):
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("❌ Использование: /cancel_round schedule_id")
+        return
+    
+    schedule_id = int(command.args.strip())
+    if await scheduler.cancel_round(schedule_id):
+        await message.answer(f"✅ Раунд {schedule_id} отменен.")
+    else:
+        await message.answer(f"❌ Раунд {schedule_id} не найден или уже начался.")
+
+def format_regrade_summary(task_id: int, summary: dict) -> str:
+    return (
+        f"🔄 <b>Перепроверка задания ID {task_id}</b>\n\n"
+        f"📝 Проверено попыток: {summary['checked']}\n"
+        f"✅ Стали правильными: {summary['now_correct']}\n"
+        f"❌ Стали неправильными: {summary['now_incorrect']}\n"
+        f"➕ Новых решивших: {summary['gained']}\n"
+        f"➖ Решение отозвано: {summary['revoked']}\n"
+        f"👥 Всего решивших: {summary['solve_count']}"
+    )
+
+@admin_router.message(Command("regrade"))
+async def cmd_regrade(message: types.Message, command: CommandObject, task_service: TaskService, admin_ids: list):
+    """Перепроверить все попытки по заданию с текущим ответом"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("❌ Использование: /regrade task_id")
+        return
+    
+    task_id = int(command.args.strip())
+    summary = await task_service.regrade_task(task_id)
+    if summary is None:
+        await message.answer(f"❌ Задание с ID {task_id} не найдено в текущем мероприятии.")
+        return
+    
+    await message.answer(format_regrade_summary(task_id, summary), parse_mode="HTML")
+
+@admin_router.message(Command("export_attempts"))
+@admin_router.message(Command("export_scores"))
+async def cmd_export(message: types.Message, command: CommandObject, task_service: TaskService, admin_ids: list):
+    """Выгрузить попытки или баллы пользователей в CSV"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    export_service = ExportService(task_service.db)
+    await message.answer("⏳ Готовлю выгрузку...")
+    
+    try:
+        if command.command == "export_attempts":
+            # Досылаем накопленные неправильные попытки, чтобы выгрузка была полной
+            if task_service.attempt_writer:
+                await task_service.attempt_writer.flush()
+            path = await export_service.export_attempts()
+        else:
+            path = await export_service.export_scores()
+    except Exception as e:
+        logger.error(f"Error in {command.command}: {e}")
+        await message.answer(f"❌ Ошибка выгрузки: {e}")
+        return
+    
+    try:
+        await message.answer_document(
+            types.FSInputFile(path, filename=f"{command.command[len('export_'):]}.csv.gz")
+        )
+    finally:
+        os.unlink(path)
+
+@admin_router.message(Command("create_team"))
+async def cmd_create_team(message: types.Message, command: CommandObject, user_service: UserService, admin_ids: list):
+    """Создать команду"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    name = (command.args or "").strip()
+    if not name or len(name) > 100:
+        await message.answer("❌ Использование: /create_team название (до 100 символов)")
+        return
+    
+    team = await user_service.create_team(name)
+    if not team:
+        await message.answer(f"❌ Команда «{html.escape(name)}» уже существует.")
+        return
+    
+    await message.answer(
+        f"✅ Команда <b>{html.escape(team.name)}</b> создана (ID {team.id}).\n"
+        f"Участники вступают командой <code>/join_team {html.escape(team.name)}</code>",
+        parse_mode="HTML"
+    )
+
+@admin_router.message(Command("set_team"))
+async def cmd_set_team(message: types.Message, command: CommandObject, user_service: UserService, admin_ids: list):
+    """Перевести пользователя в другую команду или убрать из команды"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    parts = (command.args or "").split(maxsplit=1)
+    if len(parts) != 2:
+        await message.answer(
+            "❌ <b>Использование:</b> /set_team @username название_команды\n"
+            "Чтобы убрать из команды: <code>/set_team @username -</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    username = parts[0].replace('@', '').strip()
+    user = await user_service.get_user_by_username(username)
+    if not user:
+        await message.answer(f"❌ Пользователь @{username} не найден.")
+        return
+    
+    team_name = parts[1].strip()
+    team = None
+    if team_name != "-":
+        team = user_service.find_team(team_name)
+        if not team:
+            await message.answer(f"❌ Команда «{html.escape(team_name)}» не найдена.")
+            return
+    
+    await user_service.join_team(user.telegram_id, team.id if team else None)
+    if team:
+        await message.answer(f"✅ @{username} теперь в команде <b>{html.escape(team.name)}</b>.", parse_mode="HTML")
+    else:
+        await message.answer(f"✅ @{username} больше не состоит в команде.")
+
+@admin_router.message(Command("events"))
+async def cmd_events(message: types.Message, event_service: EventService, admin_ids: list):
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    events = await event_service.get_events()
+    text = "🗓️ <b>Мероприятия:</b>\n\n"
+    for event_id, name, is_active, tasks in events:
+        mark = "▶️" if is_active else "⏸️"
+        text += f"{mark} {event_id}. {html.escape(name)} - заданий: {tasks}\n"
+    text += (
+        "\nСоздать: <code>/create_event название</code>\n"
+        "Переключить: <code>/switch_event id</code>"
+    )
+    await message.answer(text, parse_mode="HTML")
+
+@admin_router.message(Command("create_event"))
+async def cmd_create_event(message: types.Message, command: CommandObject, event_service: EventService,
+                           admin_ids: list):
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    if not command.args or not command.args.strip():
+        await message.answer("❌ Использование: /create_event название")
+        return
+    
+    event = await event_service.create_event(command.args)
+    if event is None:
+        await message.answer("❌ Мероприятие с таким названием уже есть.")
+        return
+    await message.answer(
+        f"✅ Мероприятие «{html.escape(event.name)}» создано (ID: {event.id}).\n"
+        f"Сделать активным: <code>/switch_event {event.id}</code>",
+        parse_mode="HTML"
+    )
+
+@admin_router.message(Command("switch_event"))
+async def cmd_switch_event(message: types.Message, command: CommandObject, event_service: EventService,
+                           admin_ids: list):
+    """Переключить активное мероприятие: задания и прогресс игроков меняются целиком"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("❌ Использование: /switch_event id")
+        return
+    
+    event_id = int(command.args.strip())
+    if event_id == event_service.active_event_id:
+        await message.answer("ℹ️ Это мероприятие уже активно.")
+        return
+    
+    await message.answer("⏳ Переключаю мероприятие...")
+    try:
+        result = await event_service.switch_event(event_id)
+    except Exception as e:
+        logger.error(f"Error in /switch_event: {e}")
+        await message.answer(f"❌ Ошибка переключения мероприятия: {e}")
+        return
+    if result is None:
+        await message.answer(f"❌ Мероприятие с ID {event_id} не найдено.")
+        return
+    
+    await message.answer(
+        f"✅ Активно мероприятие ID {event_id}\n\n"
+        f"💾 Сохранен прогресс игроков: {result['saved_users']}\n"
+        f"♻️ Восстановлен прогресс игроков: {result['restored_users']}\n"
+        f"📚 Активных заданий: {result['tasks']}"
+    )
+
+@admin_router.message(Command("backup"))
+async def cmd_backup(message: types.Message, backup: BackupService, admin_ids: list):
+    """Сделать снимок базы данных без остановки бота"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    if backup is None:
+        await message.answer("❌ Онлайн-копии доступны только для SQLite.")
+        return
+    if backup.running:
+        await message.answer("⏳ Копия уже создается, дождитесь ее завершения.")
+        return
+    
+    await message.answer("⏳ Создаю копию базы...")
+    try:
+        result = await backup.backup()
+    except Exception as e:
+        logger.error(f"Error in /backup: {e}")
+        await message.answer(f"❌ Ошибка резервного копирования: {e}")
+        return
+    
+    await message.answer(
+        f"💾 <b>Копия создана</b>\n\n"
+        f"📄 Файл: <code>{result.path.name}</code>\n"
+        f"📦 Размер: {result.size / 1024 / 1024:.1f} МБ\n"
+        f"⏱ Время: {result.elapsed:.1f} с\n"
+        f"🗂 Хранится копий: {len(backup.snapshots())}",
+        parse_mode="HTML"
+    )
+
+@admin_router.message(Command("api_stats"))
+async def cmd_api_stats(message: types.Message, admin_ids: list):
+    """Задержки и ошибки запросов к Bot API по методам"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    session = message.bot.session
+    if not isinstance(session, TelegramSession) or not session.metrics:
+        await message.answer("📭 Статистика запросов пока не собрана.")
+        return
+    
+    lines = [
+        f"<code>{row['method']}</code>: {row['calls']} выз., "
+        f"ср. {row['avg_ms']} мс, p95 {row['p95_ms']} мс, "
+        f"ошибок {row['errors']}, повторов {row['retries']}"
+        for row in session.metrics_summary()
+    ]
+    await message.answer(
+        f"📡 <b>Запросы к Telegram</b>\n"
+        f"⏳ В очереди: {session.waiting}\n\n" + "\n".join(lines),
+        parse_mode="HTML"
+    )
+
+@admin_router.message(Command("task_stats"))
+async def cmd_task_stats(message: types.Message, command: CommandObject, task_service: TaskService, admin_ids: list):
+    """Статистика по заданию"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("❌ Использование: /task_stats task_id")
+        return
+    
+    task_id = int(command.args.strip())
+    stats = task_service.stats.get(task_id) if task_service.stats else None
+    if not stats:
+        await message.answer(f"📭 По заданию ID {task_id} еще нет попыток.")
+        return
+    
+    median = stats['median_solve_seconds']
+    median_text = f"{median / 60:.1f} мин" if median is not None else "нет данных"
+    wrong_text = "\n".join(
+        f"  • <code>{html.escape(answer)}</code> - {count}"
+        for answer, count in stats['top_wrong_answers']
+    ) or "  нет"
+    
+    await message.answer(
+        f"📊 <b>Статистика задания ID {task_id}</b>\n\n"
+        f"📝 Попыток: {stats['attempts']}\n"
+        f"👥 Участников: {stats['participants']}\n"
+        f"✅ Решили: {stats['solvers']} ({stats['solve_rate']:.0%})\n"
+        f"⏱️ Медиана времени решения: {median_text}\n"
+        f"❌ Частые неправильные ответы:\n{wrong_text}",
+        parse_mode="HTML"
+    )
+
 @admin_router.message(Command("edit_task"))
 async def cmd_edit_task(message: types.Message, command: CommandObject, task_service: TaskService, admin_ids: list):
     if not check_admin(message.from_user.id, admin_ids):
@@ -230,34 +753,12 @@ async def cmd_edit_task(message: types.Message, command: CommandObject, task_ser
             return
         
         # Показываем информацию о задании и кнопки для редактирования
-        task_info = (
-            f"📝 <b>Редактирование задания</b>\n\n"
-            f"🆔 ID: {task.id}\n"
-            f"📚 Название: {task.title}\n"
-            f"📖 Описание: {task.description}\n"
-            f"🖼️ Картинка: {task.image_url or 'нет'}\n"
-            f"✅ Ответ: <code>{task.correct_answer}</code>\n"
-            f"🏆 Баллы: {task.points}\n"
-            f"📊 Статус: {'✅ Активно' if task.is_active else '❌ Неактивно'}\n\n"
-            f"Выберите что редактировать:"
-        )
-        
-        builder = InlineKeyboardBuilder()
-        builder.add(
-            types.InlineKeyboardButton(text="📚 Название", callback_data=f"edit_title_{task.id}"),
-            types.InlineKeyboardButton(text="📖 Описание", callback_data=f"edit_desc_{task.id}"),
-        )
-        builder.add(
-            types.InlineKeyboardButton(text="🖼️ Картинка", callback_data=f"edit_image_{task.id}"),
-            types.InlineKeyboardButton(text="✅ Ответ", callback_data=f"edit_answer_{task.id}"),
-        )
-        builder.add(
-            types.InlineKeyboardButton(text="🏆 Баллы", callback_data=f"edit_points_{task.id}"),
-            types.InlineKeyboardButton(text="📊 Статус", callback_data=f"edit_status_{task.id}"),
+        await message.answer(
+            render_task_edit(task),
+            reply_markup=edit_task_keyboard(task.id),
+            parse_mode="HTML"
         )
         
-        await message.answer(task_info, reply_markup=builder.as_markup(), parse_mode="HTML")
-        
     except ValueError:
         await message.answer("❌ Неверный формат ID задания")
 
@@ -290,6 +791,7 @@ async def edit_task_callback(callback: types.CallbackQuery, state: FSMContext):
             reply_markup=builder.as_markup()
         )
     else:
+        await state.set_state(EditTask.value)
         await callback.message.answer(f"Введите новое значение для {field_names[field]}:")
     
     await callback.answer()
@@ -354,6 +856,10 @@ async def cmd_assign_task(message: types.Message, command: CommandObject, task_s
             await message.answer(f"❌ Задание с ID {task_id} неактивно.")
             return
         
+        if task.event_id != task_service.db.active_event_id:
+            await message.answer(f"❌ Задание с ID {task_id} относится к другому мероприятию.")
+            return
+        
         # Проверяем, не решил ли пользователь уже это задание
         if await task_service.db.has_user_solved_task(user.id, task_id):
             await message.answer(
@@ -440,7 +946,55 @@ async def delete_task_button(message: types.Message):
         "<code>/delete_task 5</code>\n\n"
         "Чтобы посмотреть список заданий:\n"
         "<code>/list_tasks</code>\n\n"
-        "<i>Внимание: удаление задания необратимо!</i>",
+        "<i>Задание сразу скрывается, а его попытки удаляются позже. "
+        "До этого удаление можно отменить командой /restore_task task_id</i>",
+        parse_mode="HTML"
+    )
+
+@admin_router.message(Command("delete_task"))
+async def cmd_delete_task(message: types.Message, command: CommandObject, task_service: TaskService,
+                          purger: TaskPurger, admin_ids: list):
+    """Мягкое удаление: задание скрывается сразу, попытки удаляются в фоне"""
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("❌ Использование: /delete_task task_id")
+        return
+    
+    task_id = int(command.args.strip())
+    affected = await task_service.delete_task(task_id)
+    if affected is None:
+        await message.answer(f"❌ Задание с ID {task_id} не найдено.")
+        return
+    
+    minutes = int(purger.delay.total_seconds() // 60)
+    await message.answer(
+        f"🗑️ Задание ID {task_id} удалено.\n"
+        f"👥 Сброшено у игроков: {len(affected)}\n\n"
+        f"Попытки по заданию будут удалены через {minutes} мин. "
+        f"До этого можно отменить: <code>/restore_task {task_id}</code>",
+        parse_mode="HTML"
+    )
+
+@admin_router.message(Command("restore_task"))
+async def cmd_restore_task(message: types.Message, command: CommandObject, purger: TaskPurger, admin_ids: list):
+    if not check_admin(message.from_user.id, admin_ids):
+        return
+    
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("❌ Использование: /restore_task task_id")
+        return
+    
+    task_id = int(command.args.strip())
+    task = await purger.restore(task_id)
+    if task is None:
+        await message.answer(f"❌ Задание ID {task_id} не удалено или уже очищено.")
+        return
+    
+    await message.answer(
+        f"♻️ Задание ID {task_id} восстановлено неактивным.\n"
+        f"Включить: <code>/edit_task {task_id}</code> → Статус",
         parse_mode="HTML"
     )
 
@@ -464,13 +1018,8 @@ async def cancel_action_button(message: types.Message, state: FSMContext):
             parse_mode="HTML"
         )
 
-@admin_router.message(CreateTask.title, F.text.in_(["отмена", "cancel", "стоп", "stop", "/cancel"]))
-@admin_router.message(CreateTask.description, F.text.in_(["отмена", "cancel", "стоп", "stop", "/cancel"]))
-@admin_router.message(CreateTask.image_url, F.text.in_(["отмена", "cancel", "стоп", "stop", "/cancel"]))
-@admin_router.message(CreateTask.correct_answer, F.text.in_(["отмена", "cancel", "стоп", "stop", "/cancel"]))
-@admin_router.message(CreateTask.points, F.text.in_(["отмена", "cancel", "стоп", "stop", "/cancel"]))
 
-@admin_router.message()
+@admin_router.message(EditTask.value)
 async def handle_edit_value(message: types.Message, state: FSMContext, task_service: TaskService):
     data = await state.get_data()
     
@@ -498,6 +1047,9 @@ async def handle_edit_value(message: types.Message, state: FSMContext, task_serv
             await message.answer("❌ Неверный формат баллов")
             return
     
+    old_task = await task_service.get_task_by_id(task_id)
+    old_answer = old_task.correct_answer if old_task else None
+    
     task = await task_service.update_task(task_id, **update_data)
     
     if task:
@@ -506,4 +1058,10 @@ async def handle_edit_value(message: types.Message, state: FSMContext, task_serv
         await message.answer("❌ Ошибка при обновлении задания")
     
     await state.clear()
+    
+    # Правильный ответ изменился - прежние попытки оценивались по старому
+    if task and field == 'answer' and task.correct_answer != old_answer:
+        summary = await task_service.regrade_task(task_id)
+        if summary:
+            await message.answer(format_regrade_summary(task_id, summary), parse_mode="HTML")
 
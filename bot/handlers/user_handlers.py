@@ -1,16 +1,22 @@
 # bot/handlers/user_handlers.py
 from aiogram import Router, types, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
+from aiogram.dispatcher.event.bases import SkipHandler
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
+import html
 import logging
+from functools import lru_cache
 
 from bot.services.task_service import TaskService
 from bot.services.user_service import UserService
 from bot.models.models import Task  # Добавьте этот импорт
+from bot.utils.render import render_task_message
 
 logger = logging.getLogger(__name__)
 user_router = Router()
 
+# Клавиатуры не меняются - собираем их один раз
+@lru_cache(maxsize=None)
 def get_main_keyboard():
     builder = ReplyKeyboardBuilder()
     builder.add(types.KeyboardButton(text="🎯 Получить задание"))
@@ -18,6 +24,7 @@ def get_main_keyboard():
     builder.adjust(2)
     return builder.as_markup(resize_keyboard=True)
 
+@lru_cache(maxsize=None)
 def get_task_keyboard():
     builder = ReplyKeyboardBuilder()
     builder.add(types.KeyboardButton(text="📊 Моя статистика"))
@@ -67,7 +74,7 @@ async def cmd_task(message: types.Message, task_service: TaskService, user_servi
     # Проверяем, есть ли у пользователя уже текущее задание
     current_task = await user_service.get_user_current_task(message.from_user.id)
     if current_task:
-        await show_current_task(message, current_task)
+        await show_current_task(message, current_task, task_service)
         return
     
     # Получаем новое задание
@@ -85,15 +92,11 @@ async def cmd_task(message: types.Message, task_service: TaskService, user_servi
     await user_service.set_user_current_task(message.from_user.id, task.id)
     
     # Показываем задание
-    await show_current_task(message, task)
+    await show_current_task(message, task, task_service)
 
-async def show_current_task(message: types.Message, task: Task):  # Исправлено: Task вместо types.Task
+async def show_current_task(message: types.Message, task: Task, task_service: TaskService):  # Исправлено: Task вместо types.Task
     """Показать текущее задание пользователю"""
-    task_text = (
-        f"📚 <b>{task.title}</b>\n\n"
-        f"📖 {task.description}\n\n"
-        f"🏆 Баллов за решение: {task.points}"
-    )
+    task_text = render_task_message(task, task_service.task_value(task))
     
     if task.image_url:
         await message.answer_photo(
@@ -125,6 +128,8 @@ async def cmd_stats(message: types.Message, user_service: UserService):
             f"📝 Статус: {status}\n"
             f"{current_task_info}"
         )
+        if stats['team']:
+            stats_text += f"\n👥 Команда: {html.escape(stats['team'])}"
         
         await message.answer(stats_text, parse_mode="HTML")
     else:
@@ -138,6 +143,68 @@ async def cmd_main_menu(message: types.Message):
         parse_mode="HTML"
     )
 
+@user_router.message(Command("join_team"))
+async def cmd_join_team(message: types.Message, command: CommandObject, user_service: UserService):
+    """Вступить в команду"""
+    name = (command.args or "").strip()
+    if not name:
+        await message.answer("❌ Использование: /join_team название_команды")
+        return
+    
+    user = await user_service.get_or_create_user(
+        telegram_id=message.from_user.id,
+        username=message.from_user.username,
+        full_name=message.from_user.full_name
+    )
+    current_team = user_service.get_team(user.team_id)
+    if current_team:
+        await message.answer(
+            f"👥 Вы уже в команде <b>{html.escape(current_team.name)}</b>.\n"
+            f"Сменить команду может только администратор.",
+            parse_mode="HTML"
+        )
+        return
+    
+    team = user_service.find_team(name)
+    if not team:
+        await message.answer("❌ Команда не найдена. Уточните название у организаторов.")
+        return
+    
+    await user_service.join_team(message.from_user.id, team.id)
+    await message.answer(
+        f"✅ Вы в команде <b>{html.escape(team.name)}</b>!\n"
+        f"Каждое задание засчитывается команде один раз.",
+        parse_mode="HTML"
+    )
+
+@user_router.message(Command("leaderboard"))
+async def cmd_leaderboard(message: types.Message, user_service: UserService):
+    """Рейтинг команд"""
+    teams = user_service.get_leaderboard(10)
+    if not teams:
+        await message.answer("📭 Команд пока нет.")
+        return
+    
+    lines = [
+        f"{place}. <b>{html.escape(team.name)}</b> - {team.score} баллов ({team.members} уч.)"
+        for place, team in enumerate(teams, start=1)
+    ]
+    text = "🏆 <b>Рейтинг команд</b>\n\n" + "\n".join(lines)
+    
+    state = await user_service.get_user_state(message.from_user.id)
+    team = user_service.get_team(state.team_id) if state else None
+    if team and team not in teams:
+        text += f"\n\n👥 Ваша команда: {user_service.get_team_place(team.id)}. {html.escape(team.name)} - {team.score} баллов"
+    
+    await message.answer(text, parse_mode="HTML")
+
+@user_router.message(Command("admin"))
+async def cmd_admin_denied(message: types.Message, admin_ids: list):
+    """Ответ на /admin для не-админов (админский роутер их не пропускает)"""
+    if message.from_user.id in admin_ids:
+        raise SkipHandler()
+    await message.answer("❌ У вас нет прав для доступа к админ панели.")
+
 @user_router.message(Command("debug"))
 async def cmd_debug(message: types.Message, task_service: TaskService, user_service: UserService):
     """Команда для отладки - посмотреть состояние пользователя"""
@@ -202,28 +269,21 @@ async def handle_answer(message: types.Message, task_service: TaskService, user_
     
     logger.info(f"Answer check - Task: {current_task.id}, User answer: '{user_answer}', Correct: '{current_task.correct_answer}', Is correct: {is_correct}")
     
-    # Создаем попытку
-    await task_service.db.create_attempt(user.id, current_task.id, user_answer, is_correct)
-    
     if is_correct:
-        # Начисляем баллы
-        await user_service.update_user_score(message.from_user.id, current_task.points)
-        # Запрещаем получать новые задания
-        await user_service.update_user_task_permission(message.from_user.id, False)
-        # Очищаем текущее задание
-        await user_service.set_user_current_task(message.from_user.id, None)
-        
-        stats = await user_service.get_user_stats(message.from_user.id)
+        # Попытка, начисление баллов, запрет новых заданий и очистка
+        # текущего задания выполняются одной транзакцией
+        awarded, score = await task_service.record_solve(user.id, current_task.id, user_answer)
         
         await message.answer(
             f"✅ <b>Правильно!</b>\n\n"
-            f"🎯 Вы заработали: {current_task.points} баллов\n"
-            f"🏆 Ваш текущий счет: {stats['score']}\n\n"
+            f"🎯 Вы заработали: {awarded} баллов\n"
+            f"🏆 Ваш текущий счет: {score}\n\n"
             f"Вы решили задание! Администратор может предоставить вам новое задание.",
             reply_markup=get_main_keyboard(),
             parse_mode="HTML"
         )
     else:
+        await task_service.record_attempt(user.id, current_task.id, user_answer, is_correct)
         await message.answer(
             "❌ <b>Неправильно</b>\n\n"
             "Попробуйте еще раз!",
@@ -2,19 +2,37 @@
 import asyncio
 import logging
 import sys
+import time
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram import BaseMiddleware
 from aiogram.types import Message, TelegramObject
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
 
-from bot.utils.config import load_config
+from bot.utils.startup import StartupTimer, gather_or_cancel, run_event_loop
+from bot.utils.shutdown import ShutdownCoordinator
+from bot.utils.loop_monitor import LoopLagMonitor
 from bot.models.database import DatabaseManager
+from bot.models.user_cache import UserStateCache
 from bot.services.task_service import TaskService
 from bot.services.user_service import UserService
+from bot.services.event_service import EventService
+from bot.services.attempt_writer import AttemptWriter
+from bot.services.notifier import BulkSender
+from bot.services.scheduler import RoundScheduler
+from bot.services.scoring import ScoringPolicy
+from bot.services.task_stats import TaskStatsTracker
+from bot.services.retention import RetentionService
+from bot.services.task_purge import TaskPurger
+from bot.services.backup import BackupService, sqlite_path
+from bot.services.health import HealthServer
 from bot.handlers.user_handlers import user_router
 from bot.handlers.admin_handlers import admin_router
-from .create_bot import bot
+from bot.middlewares.user_lock import UserLockMiddleware
+from bot.middlewares.dedup import DeduplicationMiddleware
+from bot.middlewares.in_flight import InFlightMiddleware
+from bot.filters.admin import AdminFilter
+from .create_bot import bot, config
 
 # Настройка логирования
 logging.basicConfig(
@@ -24,10 +42,19 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class ServiceMiddleware(BaseMiddleware):
-    def __init__(self, task_service: TaskService, user_service: UserService, admin_ids: list):
+    def __init__(self, task_service: TaskService, user_service: UserService, admin_ids: list,
+                 notifier: BulkSender, scheduler: RoundScheduler, utc_offset: int,
+                 backup: Optional[BackupService] = None, purger: Optional[TaskPurger] = None,
+                 event_service: Optional[EventService] = None):
         self.task_service = task_service
         self.user_service = user_service
         self.admin_ids = admin_ids
+        self.notifier = notifier
+        self.scheduler = scheduler
+        self.utc_offset = utc_offset
+        self.backup = backup
+        self.purger = purger
+        self.event_service = event_service
 
     async def __call__(
         self,
@@ -38,42 +65,136 @@ class ServiceMiddleware(BaseMiddleware):
         data['task_service'] = self.task_service
         data['user_service'] = self.user_service
         data['admin_ids'] = self.admin_ids
+        data['notifier'] = self.notifier
+        data['scheduler'] = self.scheduler
+        data['utc_offset'] = self.utc_offset
+        data['backup'] = self.backup
+        data['purger'] = self.purger
+        data['event_service'] = self.event_service
         return await handler(event, data)
 
+async def check_bot_token(bot: Bot) -> None:
+    """Проверка токена через получение информации о боте"""
+    try:
+        # bot.me() кэширует результат, поэтому polling не будет запрашивать его повторно
+        bot_info = await bot.me()
+        logger.info(f"Bot initialized successfully: @{bot_info.username}")
+    except Exception as e:
+        logger.error(f"Failed to initialize bot: {e}")
+        raise
+
+async def init_database(db: DatabaseManager, stats: TaskStatsTracker, timer: StartupTimer) -> None:
+    """Проверка схемы БД и прогрев кэшей"""
+    logger.info("Initializing database...")
+    await timer.phase("schema", db.create_tables())
+    logger.info(f"Active event: {db.active_event_id}")
+    if await timer.phase("vacuum_mode", db.enable_incremental_vacuum()):
+        logger.info("SQLite switched to incremental auto_vacuum")
+    logger.info("Database initialized successfully")
+    
+    # Прогреваем кэши до запуска polling, чтобы первая волна игроков не шла в SQLite
+    warmed = await timer.phase("warmup", db.warm_up())
+    logger.info(
+        f"Caches warmed up in {warmed['elapsed_ms']}ms: "
+        f"{warmed['tasks']} active tasks, {warmed['users']} users with current task, "
+        f"{warmed['solved']} solved tasks, {warmed['teams']} teams"
+    )
+    
+    tasks_with_stats = await timer.phase("stats", stats.load())
+    logger.info(f"Task stats loaded for {tasks_with_stats} tasks")
+
 async def main():
+    timer = StartupTimer()
     try:
-        # Загрузка конфигурации
-        config = load_config()
-        logger.info("Configuration loaded successfully")
-        
-        # Инициализация бота
+        # Конфигурация уже загружена при создании бота, повторно не читаем
         logger.info("Initializing bot...")
-        
-        
-        # Проверка токена через получение информации о боте
-        try:
-            bot_info = await bot.get_me()
-            logger.info(f"Bot initialized successfully: @{bot_info.username}")
-        except Exception as e:
-            logger.error(f"Failed to initialize bot: {e}")
-            raise
+        phase_started = time.perf_counter()
         
         # Инициализация диспетчера
         storage = MemoryStorage()
         dp = Dispatcher(storage=storage)
         
-        # Инициализация базы данных
-        logger.info("Initializing database...")
-        db = DatabaseManager(config.DATABASE_URL)
-        await db.create_tables()
-        logger.info("Database initialized successfully")
+        # Внешний счетчик обрабатываемых апдейтов - при остановке их дожидаемся
+        in_flight = InFlightMiddleware()
+        dp.update.outer_middleware(in_flight)
+        shutdown = ShutdownCoordinator(dp, in_flight, drain_timeout=config.SHUTDOWN_TIMEOUT)
+        shutdown.install_signal_handlers()
+        
+        # Повторно доставленные апдейты отбрасываются до любой работы с БД
+        dedup_middleware = DeduplicationMiddleware(
+            config.DATA_DIR,
+            update_ttl=config.DEDUP_UPDATE_TTL,
+            max_updates=config.DEDUP_MAX_UPDATES,
+            content_window=config.DEDUP_CONTENT_WINDOW
+        )
+        dp.update.outer_middleware(dedup_middleware)
+        
+        # Апдейты одного пользователя обрабатываются строго по очереди,
+        # чтобы повторный ответ или /task не гонялись друг с другом
+        dp.update.outer_middleware(UserLockMiddleware())
+        
+        user_cache = UserStateCache(
+            max_memory_mb=config.USER_CACHE_MAX_MB,
+            ttl=config.USER_CACHE_TTL
+        )
+        # Настройки пула применяются только к PostgreSQL (postgresql+asyncpg://)
+        db = DatabaseManager(
+            config.DATABASE_URL,
+            user_cache=user_cache,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            statement_cache_size=config.DB_STATEMENT_CACHE_SIZE
+        )
         
         # Инициализация сервисов
-        task_service = TaskService(db)
+        attempt_writer = AttemptWriter(
+            db,
+            batch_size=config.ATTEMPT_BATCH_SIZE,
+            flush_interval=config.ATTEMPT_FLUSH_INTERVAL,
+            max_pending=config.ATTEMPT_MAX_PENDING
+        )
+        scoring = ScoringPolicy(
+            config.SCORING_MODE,
+            minimum=config.DYNAMIC_MIN_POINTS,
+            decay=config.DYNAMIC_DECAY
+        )
+        task_stats = TaskStatsTracker(db, persist_interval=config.STATS_PERSIST_INTERVAL)
+        task_service = TaskService(db, attempt_writer, scoring, task_stats)
         user_service = UserService(db)
+        event_service = EventService(db)
+        notifier = BulkSender(bot)
+        retention = RetentionService(
+            db,
+            retention_days=config.RETENTION_DAYS,
+            interval=config.RETENTION_INTERVAL,
+            batch_size=config.RETENTION_BATCH_SIZE,
+            idle_seconds=config.RETENTION_IDLE_SECONDS,
+            vacuum_pages=config.VACUUM_PAGES
+        )
+        purger = TaskPurger(
+            db, task_stats,
+            delay=config.TASK_PURGE_DELAY,
+            interval=config.TASK_PURGE_INTERVAL,
+            batch_size=config.TASK_PURGE_BATCH_SIZE
+        )
+        scheduler = RoundScheduler(db, notifier, prepare_ahead=config.ROUND_PREPARE_AHEAD)
+        # Онлайн-копии делаются только для файловой SQLite
+        database_path = sqlite_path(config.DATABASE_URL)
+        backup = BackupService(
+            database_path,
+            config.BACKUP_DIR,
+            interval=config.BACKUP_INTERVAL,
+            keep=config.BACKUP_KEEP,
+            pages_per_step=config.BACKUP_PAGES_PER_STEP,
+            step_sleep=config.BACKUP_STEP_SLEEP
+        ) if database_path else None
         
         # Создание middleware с передачей admin_ids
-        service_middleware = ServiceMiddleware(task_service, user_service, config.ADMIN_IDS)
+        service_middleware = ServiceMiddleware(
+            task_service, user_service, config.ADMIN_IDS,
+            notifier, scheduler, config.SCHEDULE_UTC_OFFSET, backup, purger, event_service
+        )
         
         # Регистрация middleware для всех роутеров
         user_router.message.middleware(service_middleware)
@@ -81,24 +202,103 @@ async def main():
         admin_router.message.middleware(service_middleware)
         admin_router.callback_query.middleware(service_middleware)
         
+        # Сообщения и колбэки не от админов отсекаются на уровне всего роутера.
+        # Состояние FSM диспетчер читает для каждого апдейта и так, экономятся фильтры обработчиков
+        admin_filter = AdminFilter(config.ADMIN_IDS)
+        admin_router.message.filter(admin_filter)
+        admin_router.callback_query.filter(admin_filter)
+        
         # Регистрация роутеров
         dp.include_router(user_router)
         dp.include_router(admin_router)
+        timer.mark("dispatcher", phase_started)
+        
+        # Задержку цикла меряем с самого старта, чтобы видеть и блокировки при прогреве
+        loop_monitor = LoopLagMonitor(threshold=config.LOOP_LAG_THRESHOLD)
+        loop_monitor.start()
+        
+        polling_started = asyncio.Event()
+        
+        async def on_polling_started():
+            polling_started.set()
+        
+        dp.startup.register(on_polling_started)
+        
+        if config.HEALTH_PORT:
+            health = HealthServer(
+                db, loop_monitor,
+                host=config.HEALTH_HOST,
+                port=config.HEALTH_PORT,
+                max_lag=config.HEALTH_MAX_LAG,
+                queues={
+                    'in_flight_updates': lambda: len(in_flight),
+                    'pending_attempts': lambda: attempt_writer.pending,
+                    'notifications': lambda: notifier.pending,
+                    'telegram_waiting': lambda: getattr(bot.session, 'waiting', 0),
+                },
+                is_ready=lambda: polling_started.is_set() and not shutdown.stopping
+            )
+            await health.start()
+        
+        # Telegram и БД не зависят друг от друга - инициализируем одновременно;
+        # при ошибке одной инициализации другая отменяется до закрытия БД в finally
+        await gather_or_cancel(
+            timer.phase("telegram", check_bot_token(bot)),
+            init_database(db, task_stats, timer)
+        )
+        timer.report()
+        
+        attempt_writer.start()
+        notifier.start()
+        task_stats.start()
+        # Планировщик стартует после прогрева: выбор заданий идет по кэшам
+        scheduler.start()
+        retention.start()
+        purger.start()
+        if backup:
+            backup.start()
         
         logger.info(f"Bot started with admin IDs: {config.ADMIN_IDS}")
         logger.info("Bot is ready to receive messages")
         
-        # Запуск бота
-        await dp.start_polling(bot)
+        # Запуск бота. Сигналы обрабатывает ShutdownCoordinator, а сессия
+        # остается открытой, чтобы дорабатывающие обработчики могли ответить
+        if not shutdown.stopping:
+            await dp.start_polling(bot, handle_signals=False, close_bot_session=False)
         
     except Exception as e:
         logger.error(f"Failed to start bot: {e}")
         sys.exit(1)
         
     finally:
+        if 'shutdown' in locals():
+            await shutdown.drain()
+        if 'backup' in locals() and backup:
+            await backup.close()
+        if 'retention' in locals():
+            await retention.close()
+        if 'purger' in locals():
+            await purger.close()
+        if 'scheduler' in locals():
+            await scheduler.close()
+        if 'notifier' in locals():
+            await notifier.close()
+        if 'attempt_writer' in locals():
+            await attempt_writer.close()
+        if 'task_stats' in locals():
+            await task_stats.close()
+        if 'dedup_middleware' in locals():
+            dedup_middleware.flush()
+        if 'health' in locals():
+            await health.close()
+        if 'loop_monitor' in locals():
+            await loop_monitor.close()
+        if 'db' in locals():
+            await db.close()
+            logger.info("Database connections closed")
         if 'bot' in locals():
             await bot.session.close()
             logger.info("Bot session closed")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run_event_loop(main())
@@ -0,0 +1,210 @@
+# bot/middlewares/dedup.py
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiringSet:
+    """Ограниченное по размеру множество, элементы которого живут ttl секунд"""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """Добавить ключ. Возвращает False, если ключ уже был и еще не истек"""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        seen_at = self._items.get(key)
+        if seen_at is not None:
+            return False
+
+        self._items[key] = now
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return True
+
+    def _expire(self, now: float) -> None:
+        # Элементы упорядочены по времени добавления - чистим с начала
+        deadline = now - self.ttl
+        while self._items:
+            key, seen_at = next(iter(self._items.items()))
+            if seen_at > deadline:
+                break
+            self._items.popitem(last=False)
+
+
+class UpdateWatermark:
+    """Отметка обработанных апдейтов, сохраняемая между перезапусками.
+
+    value - update_id, до которого включительно все начатые апдейты
+    обработаны успешно; done - успешно обработанные апдейты выше нее.
+    Выполняющийся или отмененный апдейт держит отметку: после перезапуска
+    Telegram доставит его снова, и он будет обработан. Упавший держит ее
+    retry_window секунд - потом Telegram его уже подтвердил и не пришлет.
+    """
+
+    def __init__(self, path: Path, max_age: float, retry_window: float = 60.0,
+                 save_interval: float = 1.0):
+        self.path = path
+        self.max_age = max_age
+        self.retry_window = retry_window
+        self.save_interval = save_interval
+        self.bot_id: Optional[int] = None
+        self.value = 0
+        self.done: Set[int] = set()
+        # Начатые и не завершенные апдейты, в том числе отмененные при остановке
+        self._running: Set[int] = set()
+        # Упавшие апдейты: update_id -> время ошибки
+        self._failed: Dict[int, float] = {}
+        self._dirty = False
+        self._saved_at = 0.0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            bot_id, update_id, saved_at, *done = self.path.read_text().split()
+            bot_id, update_id, saved_at = int(bot_id), int(update_id), float(saved_at)
+            done = {int(item) for item in done}
+        except FileNotFoundError:
+            return
+        except ValueError:
+            logger.warning(f"Corrupted dedup watermark at {self.path}, ignoring")
+            return
+
+        # После недели простоя Telegram начинает нумерацию апдейтов заново,
+        # поэтому старой отметке доверяем ограниченное время
+        if time.time() - saved_at > self.max_age:
+            logger.info("Dedup watermark is too old, ignoring")
+            return
+
+        self.bot_id = bot_id
+        self.value = update_id
+        self.done = done
+        logger.info(f"Dedup watermark loaded: update_id={self.value}, {len(self.done)} above it")
+
+    def is_processed(self, bot_id: int, update_id: int) -> bool:
+        return self.bot_id == bot_id and (update_id <= self.value or update_id in self.done)
+
+    def start(self, bot_id: int, update_id: int) -> None:
+        if self.bot_id != bot_id:
+            self.bot_id = bot_id
+            self.value = 0
+            self.done.clear()
+            self._running.clear()
+            self._failed.clear()
+        self._running.add(update_id)
+
+    def fail(self, bot_id: int, update_id: int) -> None:
+        """Отметить апдейт, обработчик которого завершился ошибкой"""
+        if self.bot_id == bot_id:
+            self._running.discard(update_id)
+            self._failed[update_id] = time.monotonic()
+
+    def finish(self, bot_id: int, update_id: int) -> None:
+        """Отметить успешно обработанный апдейт"""
+        if self.bot_id != bot_id:
+            return
+        self._running.discard(update_id)
+        if update_id > self.value:
+            self.done.add(update_id)
+            self._dirty = True
+        self._advance()
+
+        if time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def _advance(self) -> None:
+        deadline = time.monotonic() - self.retry_window
+        for update_id, failed_at in list(self._failed.items()):
+            if failed_at < deadline:
+                logger.warning(f"Update {update_id} failed, no longer waiting for redelivery")
+                del self._failed[update_id]
+
+        # Апдейты входят в middleware по возрастанию update_id, поэтому все
+        # завершенные ниже самого раннего незавершенного - сплошной префикс
+        lowest_pending = min(self._running | self._failed.keys(), default=None)
+        ready = [update_id for update_id in self.done
+                 if lowest_pending is None or update_id < lowest_pending]
+        if ready:
+            self.value = max(self.value, *ready)
+            self.done.difference_update(ready)
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty or self.bot_id is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        done = " ".join(map(str, sorted(self.done)))
+        tmp_path.write_text(f"{self.bot_id} {self.value} {time.time()} {done}".rstrip())
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+
+class DeduplicationMiddleware(BaseMiddleware):
+    """Отбрасывает повторно доставленные апдейты и одинаковые сообщения подряд"""
+
+    def __init__(self, data_dir: str, update_ttl: float = 600.0,
+                 max_updates: int = 50000, content_window: float = 3.0):
+        self.updates = ExpiringSet(update_ttl, max_updates)
+        self.contents = ExpiringSet(content_window, max_updates)
+        self.watermark = UpdateWatermark(
+            Path(data_dir) / "dedup_watermark",
+            max_age=24 * 60 * 60
+        )
+        self.dropped = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        bot_id = data["bot"].id
+        update_id = event.update_id
+
+        if self.watermark.is_processed(bot_id, update_id) or not self.updates.add(update_id):
+            self.dropped += 1
+            logger.info(f"Dropped duplicate update {update_id}")
+            return None
+
+        message = event.message
+        if message and message.text and message.from_user:
+            content_key = (message.from_user.id, hash(message.text))
+            if not self.contents.add(content_key):
+                self.dropped += 1
+                logger.info(f"Dropped repeated message from user {message.from_user.id}")
+                return None
+
+        self.watermark.start(bot_id, update_id)
+        try:
+            result = await handler(event, data)
+        except Exception:
+            self.watermark.fail(bot_id, update_id)
+            raise
+        # Отмененный при остановке апдейт (CancelledError) остается незавершенным,
+        # и сохраненная в flush() отметка его не пропускает
+        self.watermark.finish(bot_id, update_id)
+        return result
+
+    def flush(self) -> None:
+        """Сохранить отметку на диск (вызывается при остановке)"""
+        self.watermark.save()
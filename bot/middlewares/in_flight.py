@@ -0,0 +1,61 @@
+# bot/middlewares/in_flight.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """Учет апдейтов, которые сейчас обрабатываются, для корректной остановки"""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self._tasks.discard(task)
+            if not self._tasks:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> int:
+        """Дождаться завершения обработчиков; не успевшие за timeout отменяются.
+
+        Возвращает число отмененных обработчиков.
+        """
+        # Задачи апдейтов, полученных последним запросом, могли еще не дойти до middleware
+        await asyncio.sleep(0)
+        if self._tasks:
+            logger.info(f"Waiting for {len(self._tasks)} in-flight updates")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return 0
+        except asyncio.TimeoutError:
+            pass
+
+        # Отмена откатывает открытую транзакцию, так что баллы не применятся наполовину,
+        # а отметка дедупликации их не пропускает - после перезапуска они придут снова
+        stuck = list(self._tasks)
+        for task in stuck:
+            task.cancel()
+        await asyncio.gather(*stuck, return_exceptions=True)
+        logger.warning(f"Cancelled {len(stuck)} updates still running after {timeout}s")
+        return len(stuck)
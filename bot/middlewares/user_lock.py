@@ -0,0 +1,80 @@
+# bot/middlewares/user_lock.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+logger = logging.getLogger(__name__)
+
+
+class _LockEntry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Сколько корутин сейчас держат или ждут эту блокировку
+        self.users = 0
+
+
+class UserLockManager:
+    """Блокировки по ключу (telegram_id) с удалением простаивающих записей"""
+
+    def __init__(self):
+        self._locks: Dict[int, _LockEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    async def acquire(self, key: int) -> _LockEntry:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _LockEntry()
+        entry.users += 1
+        try:
+            await entry.lock.acquire()
+        except BaseException:
+            self._release_entry(key, entry)
+            raise
+        return entry
+
+    def release(self, key: int, entry: _LockEntry) -> None:
+        entry.lock.release()
+        self._release_entry(key, entry)
+
+    def _release_entry(self, key: int, entry: _LockEntry) -> None:
+        entry.users -= 1
+        # Никто не ждет - блокировка больше не нужна, не держим ее в памяти
+        if entry.users == 0 and self._locks.get(key) is entry:
+            del self._locks[key]
+
+    def locked(self, key: int) -> bool:
+        entry = self._locks.get(key)
+        return entry is not None and entry.lock.locked()
+
+
+class UserLockMiddleware(BaseMiddleware):
+    """Последовательная обработка апдейтов одного пользователя.
+
+    Апдейты разных пользователей по-прежнему обрабатываются параллельно.
+    """
+
+    def __init__(self, lock_manager: Optional[UserLockManager] = None):
+        self.lock_manager = lock_manager or UserLockManager()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        entry = await self.lock_manager.acquire(user.id)
+        try:
+            return await handler(event, data)
+        finally:
+            self.lock_manager.release(user.id, entry)
@@ -1,76 +1,437 @@
 # bot/models/database.py
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy import select, and_, not_, func
-from typing import List, Optional
-from .models import Base, User, Task, UserAttempt
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import (select, update, insert, delete, and_, or_, not_, case, func, inspect, text,
+                        union_all, literal)
+from sqlalchemy.engine import make_url
+from sqlalchemy.event import listen
+from sqlalchemy.exc import IntegrityError
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from datetime import datetime
+from .models import (Base, User, Task, UserAttempt, RoundSchedule, ScheduledAssignment,
+                     TaskStatsRecord, ArchivedAttempt, Team, TeamSolve,
+                     Event, EventParticipant, EventTeamScore)
+from .user_cache import UserState, UserStateCache
+from .task_cache import TaskCache, SolvedTasksCache
+from .team_cache import TeamCache
+from bot.services.scoring import ScoringPolicy
 import logging
+import re
+import time
+
+# Колонки, из которых собирается запись кэша пользователя
+USER_STATE_COLUMNS = (
+    User.id, User.telegram_id, User.username, User.score,
+    User.can_get_task, User.current_task_id, User.team_id, User.full_name
+)
+
+# Колонки, которые переносятся между user_attempts и архивом
+ATTEMPT_COLUMNS = ('id', 'event_id', 'user_id', 'task_id', 'user_answer', 'is_correct', 'attempted_at')
+
+def _attempt_columns(model) -> list:
+    return [getattr(model, name) for name in ATTEMPT_COLUMNS]
+
+# Индексы, замененные индексами с event_id в начале
+OBSOLETE_INDEXES = ("ix_user_attempts_user_task",)
+
+DEFAULT_EVENT_NAME = "Основное мероприятие"
+
+def _migrate_schema(connection) -> List[str]:
+    """Добавить в существующие таблицы недостающие колонки и индексы"""
+    inspector = inspect(connection)
+    added = []
+    for name in OBSOLETE_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    for table in Base.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            connection.execute(text(ddl))
+            added.append(f"{table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    return added
+
+def _rebuild_attempts_autoincrement(connection) -> bool:
+    """Пересоздать user_attempts в SQLite с AUTOINCREMENT. True, если таблица пересоздана.
+
+    Без AUTOINCREMENT SQLite выдает заново id заархивированных последних строк,
+    и id в горячей таблице и архиве совпадают. Уже совпавшие архивные id
+    переносятся за максимальный id, счетчик sqlite_sequence ставится
+    не ниже максимального id обеих таблиц.
+    """
+    table = UserAttempt.__table__
+    ddl = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': table.name}
+    ).scalar()
+    if "AUTOINCREMENT" in ddl.upper():
+        return False
+    
+    connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {table.name}_old"))
+    # Индексы переехали вместе со старой таблицей, их имена нужны новой
+    for index in table.indexes:
+        connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    table.create(connection)
+    columns = ", ".join(column.name for column in table.columns)
+    connection.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {table.name}_old"))
+    connection.execute(text(f"DROP TABLE {table.name}_old"))
+    
+    archive = ArchivedAttempt.__table__.name
+    top = connection.execute(text(
+        f"SELECT max(coalesce((SELECT max(id) FROM {table.name}), 0), "
+        f"coalesce((SELECT max(id) FROM {archive}), 0))"
+    )).scalar()
+    connection.execute(
+        text(f"UPDATE {archive} SET id = id + :top WHERE id IN (SELECT id FROM {table.name})"),
+        {'top': top}
+    )
+    connection.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {'name': table.name})
+    connection.execute(
+        text(f"INSERT INTO sqlite_sequence (name, seq) SELECT :name, coalesce(max(id), 0) FROM "
+             f"(SELECT id FROM {table.name} UNION ALL SELECT id FROM {archive})"),
+        {'name': table.name}
+    )
+    return True
+
+# Полнотекстовый индекс заданий (SQLite FTS5) поверх таблицы tasks.
+# Содержимое не дублируется, индекс синхронизируют триггеры.
+TASK_SEARCH_DDL = (
+    """CREATE VIRTUAL TABLE tasks_fts USING fts5(
+        title, description,
+        content='tasks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+)
+
+# Маркеры совпадений в snippet(): не пересекаются с HTML, заменяются после экранирования
+MATCH_START, MATCH_END = "\x02", "\x03"
+
+# INSERT с ON CONFLICT для поддерживаемых диалектов, API у обоих одинаковый
+UPSERT_INSERTS = {'sqlite': sqlite_insert, 'postgresql': pg_insert}
+
+def _create_search_index(connection) -> bool:
+    """Создать FTS5-индекс заданий и триггеры. True, если индекс построен заново"""
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'")
+    ).first()
+    if not exists:
+        connection.execute(text(TASK_SEARCH_DDL[0]))
+    for ddl in TASK_SEARCH_DDL[1:]:
+        connection.execute(text(ddl))
+    if not exists:
+        # Индекс появился в БД с уже созданными заданиями
+        connection.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+    return not exists
+
+def search_words(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())[:10]
+
+def build_match_query(query: str) -> Optional[str]:
+    """Запрос пользователя -> выражение MATCH: все слова, каждое как префикс"""
+    words = search_words(query)
+    if not words:
+        return None
+    # Кавычки отключают синтаксис FTS5 (AND, NEAR, *, -) внутри пользовательского ввода
+    return " ".join(f'"{word}"*' for word in words)
+
+def build_snippet(description: str, words: List[str], width: int = 80) -> str:
+    """Фрагмент описания вокруг первого совпадения, совпадения в маркерах MATCH_START/MATCH_END"""
+    pattern = re.compile("|".join(re.escape(word) for word in words), re.IGNORECASE)
+    found = pattern.search(description)
+    start = max(0, found.start() - width // 2) if found else 0
+    fragment = description[start:start + width]
+    fragment = pattern.sub(lambda m: f"{MATCH_START}{m.group(0)}{MATCH_END}", fragment)
+    return ("…" if start else "") + fragment + ("…" if start + width < len(description) else "")
+
+# Сколько писатель ждет освобождения SQLite, прежде чем получить "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = 15000
+
+def _configure_sqlite(dbapi_connection, connection_record) -> None:
+    """WAL: долгое чтение (экспорт, бэкап) не блокирует запись и наоборот"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
 
 class DatabaseManager:
-    def __init__(self, database_url: str):
-        self.engine = create_async_engine(database_url)
+    def __init__(self, database_url: str, user_cache: Optional[UserStateCache] = None,
+                 pool_size: int = 10, max_overflow: int = 20, pool_timeout: float = 30,
+                 statement_cache_size: int = 500):
+        engine_options = {}
+        if make_url(database_url).get_backend_name() == 'postgresql':
+            engine_options = dict(
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=pool_timeout,
+                pool_pre_ping=True,
+                connect_args={
+                    # Кэш подготовленных выражений asyncpg на каждое соединение
+                    'prepared_statement_cache_size': statement_cache_size,
+                    # func.now() должен давать naive UTC, как CURRENT_TIMESTAMP в SQLite
+                    'server_settings': {'timezone': 'UTC'},
+                }
+            )
+        self.engine = create_async_engine(database_url, **engine_options)
+        if self.engine.dialect.name == 'sqlite':
+            listen(self.engine.sync_engine, "connect", _configure_sqlite)
         self.async_session = async_sessionmaker(
             self.engine, 
             class_=AsyncSession, 
             expire_on_commit=False
         )
+        # Все методы, меняющие пользователя, сразу обновляют кэш
+        self.user_cache = user_cache or UserStateCache()
+        self.task_cache = TaskCache()
+        self.solved_cache = SolvedTasksCache()
+        self.team_cache = TeamCache()
+        # Задания, попытки и прогресс берутся только из активного мероприятия
+        self.active_event_id: Optional[int] = None
+
+    @property
+    def dialect(self) -> str:
+        return self.engine.dialect.name
+
+    def _upsert(self, model):
+        """INSERT ... ON CONFLICT для текущего диалекта"""
+        return UPSERT_INSERTS[self.dialect](model)
 
     async def create_tables(self):
         """Создание таблиц"""
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            added = await conn.run_sync(_migrate_schema)
+            if added:
+                logging.info(f"Added missing columns: {', '.join(added)}")
+            if 'tasks.solve_count' in added:
+                # Счетчик решивших появился в уже работающей БД - заполняем его один раз
+                solvers = (
+                    select(func.count(func.distinct(UserAttempt.user_id)))
+                    .where(UserAttempt.task_id == Task.id, UserAttempt.is_correct == True)
+                    .scalar_subquery()
+                )
+                await conn.execute(update(Task).values(solve_count=solvers))
+            if conn.dialect.name == 'sqlite' and await conn.run_sync(_create_search_index):
+                logging.info("Built full-text index for tasks")
+            
+            self.active_event_id = await self._ensure_active_event(conn)
+            self.task_cache.event_id = self.active_event_id
+            # Данные, созданные до появления мероприятий, относятся к первому
+            for model in (Task, UserAttempt, ArchivedAttempt):
+                if f"{model.__tablename__}.event_id" in added:
+                    await conn.execute(
+                        update(model).where(model.event_id.is_(None)).values(event_id=self.active_event_id)
+                    )
+            if conn.dialect.name == 'sqlite' and await conn.run_sync(_rebuild_attempts_autoincrement):
+                logging.info("Rebuilt user_attempts with AUTOINCREMENT ids")
 
-    # User methods
-    async def get_or_create_user(self, telegram_id: int, username: str, full_name: str) -> User:
-        """Получить или создать пользователя"""
+    async def _ensure_active_event(self, conn) -> int:
+        """id активного мероприятия; в новой БД создается мероприятие по умолчанию"""
+        active = await conn.scalar(select(Event.id).where(Event.is_active == True).limit(1))
+        if active is not None:
+            return active
+        active = await conn.scalar(select(Event.id).order_by(Event.id).limit(1))
+        if active is None:
+            return await conn.scalar(
+                insert(Event).values(name=DEFAULT_EVENT_NAME, is_active=True).returning(Event.id)
+            )
+        await conn.execute(update(Event).where(Event.id == active).values(is_active=True))
+        return active
+
+    async def close(self) -> None:
+        """Закрыть все соединения пула"""
+        await self.engine.dispose()
+
+    async def ping(self) -> None:
+        """Проверка доступности БД"""
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def warm_up(self) -> dict:
+        """Прогрев кэшей: активные задания, пользователи с заданием, решенные задания"""
+        started_at = time.perf_counter()
+        counts = {'tasks': 0, 'users': 0, 'solved': 0, 'teams': 0}
+        
         async with self.async_session() as session:
-            result = await session.execute(
-                select(User).where(User.telegram_id == telegram_id)
+            tasks = await session.stream_scalars(
+                select(Task).where(Task.event_id == self.active_event_id, Task.is_active == True)
             )
-            user = result.scalar_one_or_none()
+            async for task in tasks:
+                self.task_cache.put(task)
+                counts['tasks'] += 1
+            self.task_cache.complete = True
             
-            if user is None:
-                user = User(
-                    telegram_id=telegram_id,
-                    username=username,
-                    full_name=full_name
+            users = await session.stream(
+                select(*USER_STATE_COLUMNS).where(User.current_task_id.is_not(None))
+            )
+            async for row in users:
+                self.user_cache.put(*row)
+                counts['users'] += 1
+            
+            solved = await session.stream(
+                select(UserAttempt.user_id, UserAttempt.task_id)
+                .where(UserAttempt.event_id == self.active_event_id, UserAttempt.is_correct == True)
+                .distinct()
+            )
+            async for user_id, task_id in solved:
+                self.solved_cache.add(user_id, task_id)
+                counts['solved'] += 1
+            self.solved_cache.complete = True
+            
+            counts['teams'] = await self._load_teams(session)
+        
+        counts['elapsed_ms'] = round((time.perf_counter() - started_at) * 1000)
+        return counts
+
+    # User methods
+    async def get_or_create_user(self, telegram_id: int, username: Optional[str], full_name: str) -> UserState:
+        """Получить или создать пользователя, обновив username и имя"""
+        states = await self.upsert_users([(telegram_id, username, full_name)])
+        return states[telegram_id]
+
+    async def upsert_users(self, profiles: List[Tuple[int, Optional[str], str]],
+                           chunk_size: int = 300) -> Dict[int, UserState]:
+        """Зарегистрировать пакет пользователей (telegram_id, username, full_name).
+
+        INSERT ... ON CONFLICT(telegram_id) DO UPDATE пишет строку, только если
+        пользователя нет или изменился username/имя; одновременные первые
+        сообщения не упираются в уникальный индекс. Неизмененные строки
+        RETURNING не возвращает - их состояние дочитывается одним SELECT.
+        """
+        # Один telegram_id дважды в одном INSERT ... ON CONFLICT недопустим
+        unique = {telegram_id: (username, full_name) for telegram_id, username, full_name in profiles}
+        values = [
+            {'telegram_id': telegram_id, 'username': username, 'full_name': full_name}
+            for telegram_id, (username, full_name) in unique.items()
+        ]
+        rows = []
+        async with self.async_session() as session:
+            for start in range(0, len(values), chunk_size):
+                stmt = self._upsert(User).values(values[start:start + chunk_size])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[User.telegram_id],
+                    set_={'username': stmt.excluded.username, 'full_name': stmt.excluded.full_name},
+                    where=or_(
+                        User.username.is_distinct_from(stmt.excluded.username),
+                        User.full_name.is_distinct_from(stmt.excluded.full_name)
+                    )
                 )
-                session.add(user)
-                await session.commit()
-                await session.refresh(user)
+                result = await session.execute(stmt.returning(*USER_STATE_COLUMNS))
+                rows.extend(result.all())
             
-            return user
+            written = {row.telegram_id for row in rows}
+            unchanged = [telegram_id for telegram_id in unique if telegram_id not in written]
+            for start in range(0, len(unchanged), chunk_size):
+                result = await session.execute(
+                    select(*USER_STATE_COLUMNS)
+                    .where(User.telegram_id.in_(unchanged[start:start + chunk_size]))
+                )
+                rows.extend(result.all())
+            await session.commit()
+        
+        return {row.telegram_id: self.user_cache.put(*row) for row in rows}
 
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
         """Получить пользователя по telegram_id"""
-        async with self.async_session() as session:
-            result = await session.execute(
-                select(User).where(User.telegram_id == telegram_id)
-            )
-            return result.scalar_one_or_none()
-
-    async def update_user_score(self, telegram_id: int, points: int) -> None:
-        """Обновить счет пользователя"""
         async with self.async_session() as session:
             result = await session.execute(
                 select(User).where(User.telegram_id == telegram_id)
             )
             user = result.scalar_one_or_none()
-            
             if user:
-                user.score += points
+                self.user_cache.put_user(user)
+            return user
+
+    async def _update_user(self, telegram_id: int, **values) -> None:
+        """Обновить поля пользователя одним UPDATE и записать результат в кэш"""
+        try:
+            async with self.async_session() as session:
+                result = await session.execute(
+                    update(User)
+                    .where(User.telegram_id == telegram_id)
+                    .values(**values)
+                    .returning(*USER_STATE_COLUMNS)
+                )
+                row = result.one_or_none()
+                await session.commit()
+        except Exception:
+            # Состояние в БД неизвестно - не доверяем кэшу
+            self.user_cache.invalidate(telegram_id)
+            raise
+        
+        if row:
+            self.user_cache.put(*row)
+
+    async def update_user_score(self, telegram_id: int, points: int) -> None:
+        """Обновить счет пользователя и его команды одной транзакцией"""
+        team_row = None
+        try:
+            async with self.async_session() as session:
+                result = await session.execute(
+                    update(User)
+                    .where(User.telegram_id == telegram_id)
+                    .values(score=User.score + points)
+                    .returning(*USER_STATE_COLUMNS)
+                )
+                row = result.one_or_none()
+                if row and row.team_id is not None:
+                    result = await session.execute(
+                        update(Team)
+                        .where(Team.id == row.team_id)
+                        .values(score=Team.score + points)
+                        .returning(Team.id, Team.score)
+                    )
+                    team_row = result.one_or_none()
                 await session.commit()
+        except Exception:
+            self.user_cache.invalidate(telegram_id)
+            raise
+        
+        if row:
+            self.user_cache.put(*row)
+        if team_row:
+            self.team_cache.set_score(*team_row)
 
     async def update_user_task_permission(self, telegram_id: int, can_get_task: bool) -> None:
         """Обновить разрешение на получение заданий"""
+        await self._update_user(telegram_id, can_get_task=can_get_task)
+
+    async def open_round(self, min_score: Optional[int] = None, only_solved: bool = False) -> List[int]:
+        """Разрешить новое задание всем подходящим пользователям одним UPDATE.
+
+        Возвращает telegram_id пользователей, которым открыт раунд.
+        """
+        stmt = update(User).values(can_get_task=True, current_task_id=None)
+        if min_score is not None:
+            stmt = stmt.where(User.score >= min_score)
+        if only_solved:
+            stmt = stmt.where(User.can_get_task == False)
+        
         async with self.async_session() as session:
-            result = await session.execute(
-                select(User).where(User.telegram_id == telegram_id)
-            )
-            user = result.scalar_one_or_none()
-            
-            if user:
-                user.can_get_task = can_get_task
-                await session.commit()
+            result = await session.execute(stmt.returning(*USER_STATE_COLUMNS))
+            rows = result.all()
+            await session.commit()
+        
+        for row in rows:
+            self.user_cache.put(*row)
+        return [row.telegram_id for row in rows]
 
     async def get_all_users(self) -> List[User]:
         """Получить всех пользователей"""
@@ -84,6 +445,7 @@ class DatabaseManager:
         """Создать новое задание"""
         async with self.async_session() as session:
             task = Task(
+                event_id=self.active_event_id,
                 title=title,
                 description=description,
                 image_url=image_url,
@@ -93,6 +455,7 @@ class DatabaseManager:
             session.add(task)
             await session.commit()
             await session.refresh(task)
+            self.task_cache.put(task)
             return task
 
     async def get_random_task_for_user(self, user_id: int) -> Optional[Task]:
@@ -116,42 +479,311 @@ class DatabaseManager:
 
     async def get_task_by_id(self, task_id: int) -> Optional[Task]:
         """Получить задание по ID"""
+        task = self.task_cache.get(task_id)
+        if task is not None:
+            return task
+        
         async with self.async_session() as session:
             result = await session.execute(
-                select(Task).where(Task.id == task_id)
+                select(Task).where(Task.id == task_id, Task.deleted_at.is_(None))
             )
-            return result.scalar_one_or_none()
+            task = result.scalar_one_or_none()
+            if task:
+                self.task_cache.put(task)
+            return task
+
+    async def search_tasks(self, query: str, limit: int = 5, offset: int = 0) -> Tuple[list, int]:
+        """Поиск заданий по названию и описанию с ранжированием BM25.
+
+        Возвращает (строки (id, title, is_active, snippet), всего найдено).
+        Совпадения в snippet обрамлены MATCH_START/MATCH_END.
+        FTS5 есть только в SQLite, для других БД - поиск через ILIKE.
+        """
+        if self.dialect != 'sqlite':
+            return await self._search_tasks_like(query, limit, offset)
+        match = build_match_query(query)
+        if match is None:
+            return [], 0
+        async with self.async_session() as session:
+            total = await session.scalar(
+                text(
+                    "SELECT count(*) FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid "
+                    "WHERE tasks_fts MATCH :match AND tasks.event_id = :event AND tasks.deleted_at IS NULL"
+                ),
+                {'match': match, 'event': self.active_event_id}
+            )
+            if not total:
+                return [], 0
+            # Совпадение в названии весит больше, чем в описании
+            result = await session.execute(
+                text(
+                    "SELECT tasks.id, tasks.title, tasks.is_active, "
+                    "snippet(tasks_fts, 1, :start, :end, '…', 12) "
+                    "FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid "
+                    "WHERE tasks_fts MATCH :match AND tasks.event_id = :event AND tasks.deleted_at IS NULL "
+                    "ORDER BY bm25(tasks_fts, 10.0, 1.0), tasks.id "
+                    "LIMIT :limit OFFSET :offset"
+                ),
+                {'match': match, 'event': self.active_event_id, 'start': MATCH_START, 'end': MATCH_END,
+                 'limit': limit, 'offset': offset}
+            )
+            return result.all(), total
+
+    async def _search_tasks_like(self, query: str, limit: int, offset: int) -> Tuple[list, int]:
+        """Поиск без FTS5: все слова через ILIKE, совпадения в названии выше"""
+        words = search_words(query)
+        if not words:
+            return [], 0
+        # В \w входит "_" - в LIKE это шаблон, экранируем
+        patterns = ["%" + word.replace("_", "\\_") + "%" for word in words]
+        conditions = [
+            or_(Task.title.ilike(pattern, escape="\\"), Task.description.ilike(pattern, escape="\\"))
+            for pattern in patterns
+        ]
+        title_hits = sum(case((Task.title.ilike(pattern, escape="\\"), 1), else_=0) for pattern in patterns)
+        found = and_(Task.event_id == self.active_event_id, Task.deleted_at.is_(None), *conditions)
+        async with self.async_session() as session:
+            total = await session.scalar(select(func.count()).select_from(Task).where(found))
+            if not total:
+                return [], 0
+            result = await session.execute(
+                select(Task.id, Task.title, Task.is_active, Task.description)
+                .where(found)
+                .order_by(title_hits.desc(), Task.id)
+                .limit(limit)
+                .offset(offset)
+            )
+            rows = [(task_id, title, is_active, build_snippet(description, words))
+                    for task_id, title, is_active, description in result.all()]
+        return rows, total
 
     async def get_all_tasks(self) -> List[Task]:
         """Получить все задания"""
         async with self.async_session() as session:
             result = await session.execute(
-                select(Task).order_by(Task.id)
+                select(Task)
+                .where(Task.event_id == self.active_event_id, Task.deleted_at.is_(None))
+                .order_by(Task.id)
             )
             return result.scalars().all()
 
-    async def update_task(self, task_id: int, **kwargs) -> Optional[Task]:
-        """Обновить задание"""
+    async def update_task(self, task_id: int, scoring: Optional[ScoringPolicy] = None,
+                          **kwargs) -> Optional[Task]:
+        """Обновить задание.
+
+        Если с scoring меняются баллы, решившим и их командам в той же транзакции
+        начисляется разница стоимости задания: record_solve и перепроверка
+        считают, что каждый решивший получил текущую стоимость.
+        """
+        rows = []
+        team_rows = []
         async with self.async_session() as session:
+            # Сначала UPDATE строки задания - так транзакция упорядочивается с record_solve
             result = await session.execute(
-                select(Task).where(Task.id == task_id)
+                update(Task)
+                .where(Task.id == task_id, Task.deleted_at.is_(None))
+                .values(solve_count=Task.solve_count)
+                .returning(Task.solve_count, Task.points)
             )
-            task = result.scalar_one_or_none()
+            current = result.one_or_none()
+            if current is None:
+                return None
+            solve_count, old_points = current
+            task = await session.scalar(select(Task).where(Task.id == task_id))
             
-            if task:
-                for key, value in kwargs.items():
-                    if hasattr(task, key):
-                        setattr(task, key, value)
-                await session.commit()
-                await session.refresh(task)
+            for key, value in kwargs.items():
+                if hasattr(task, key):
+                    setattr(task, key, value)
+            task.version = Task.version + 1
             
-            return task
+            delta = 0
+            if scoring is not None and task.points != old_points:
+                delta = scoring.value(task.points, solve_count) - scoring.value(old_points, solve_count)
+            if delta:
+                solvers = select(UserAttempt.user_id).where(
+                    UserAttempt.task_id == task_id, UserAttempt.is_correct == True
+                )
+                teams = select(TeamSolve.team_id).where(TeamSolve.task_id == task_id)
+                if task.event_id == self.active_event_id:
+                    result = await session.execute(
+                        update(User)
+                        .where(User.id.in_(solvers))
+                        .values(score=User.score + delta)
+                        .returning(*USER_STATE_COLUMNS)
+                        .execution_options(synchronize_session=False)
+                    )
+                    rows = result.all()
+                    result = await session.execute(
+                        update(Team)
+                        .where(Team.id.in_(teams))
+                        .values(score=Team.score + delta)
+                        .returning(Team.id, Team.score)
+                        .execution_options(synchronize_session=False)
+                    )
+                    team_rows = result.all()
+                else:
+                    # Прогресс неактивного мероприятия хранится отдельно
+                    await session.execute(
+                        update(EventParticipant)
+                        .where(EventParticipant.event_id == task.event_id,
+                               EventParticipant.user_id.in_(solvers))
+                        .values(score=EventParticipant.score + delta)
+                        .execution_options(synchronize_session=False)
+                    )
+                    await session.execute(
+                        update(EventTeamScore)
+                        .where(EventTeamScore.event_id == task.event_id,
+                               EventTeamScore.team_id.in_(teams))
+                        .values(score=EventTeamScore.score + delta)
+                        .execution_options(synchronize_session=False)
+                    )
+            await session.commit()
+            await session.refresh(task)
+        
+        self.task_cache.put(task)
+        for row in rows:
+            self.user_cache.put(*row)
+        for team_id, team_score in team_rows:
+            self.team_cache.set_score(team_id, team_score)
+        if delta:
+            logging.info(f"Task {task_id} points changed, rebalanced {len(rows)} solvers by {delta}")
+        return task
+
+    # Task deletion: мягкое удаление и фоновая очистка порциями
+    async def soft_delete_task(self, task_id: int) -> Optional[List[int]]:
+        """Скрыть задание одной короткой транзакцией.
+
+        Задание становится неактивным и помечается deleted_at, у игроков
+        сбрасывается текущее задание, подготовленные назначения раундов
+        на него отменяются. Попытки не трогаются - их удаляет purge.
+        Возвращает telegram_id игроков, у которых было это задание, или None.
+        """
+        async with self.async_session() as session:
+            deleted = await session.scalar(
+                update(Task)
+                .where(Task.id == task_id, Task.deleted_at.is_(None))
+                .values(is_active=False, deleted_at=func.now())
+                .returning(Task.id)
+            )
+            if deleted is None:
+                return None
+            result = await session.execute(
+                update(User)
+                .where(User.current_task_id == task_id)
+                .values(current_task_id=None)
+                .returning(*USER_STATE_COLUMNS)
+            )
+            rows = result.all()
+            await session.execute(
+                update(ScheduledAssignment)
+                .where(ScheduledAssignment.task_id == task_id)
+                .values(task_id=None)
+            )
+            await session.execute(
+                update(EventParticipant)
+                .where(EventParticipant.current_task_id == task_id)
+                .values(current_task_id=None)
+            )
+            await session.commit()
+        
+        self.task_cache.remove(task_id)
+        for row in rows:
+            self.user_cache.put(*row)
+        return [row.telegram_id for row in rows]
+
+    async def restore_task(self, task_id: int, deleted_after: datetime) -> Optional[Task]:
+        """Отменить удаление, если задание удалено позже deleted_after.
+
+        Более ранние удаления уже может обрабатывать purge. Задание
+        возвращается неактивным - включает его админ.
+        """
+        async with self.async_session() as session:
+            task = await session.scalar(
+                update(Task)
+                .where(Task.id == task_id, Task.deleted_at > deleted_after)
+                .values(deleted_at=None)
+                .returning(Task)
+            )
+            await session.commit()
+        if task:
+            self.task_cache.put(task)
+        return task
+
+    async def get_purgeable_tasks(self, deleted_before: datetime) -> List[int]:
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(Task.id).where(Task.deleted_at <= deleted_before).order_by(Task.id)
+            )
+            return result.scalars().all()
+
+    async def delete_task_attempts_chunk(self, task_id: int, limit: int,
+                                         archived: bool = False) -> List[Tuple[int, bool]]:
+        """Удалить до limit попыток удаленного задания из user_attempts или архива.
+
+        Возвращает (user_id, is_correct) удаленных попыток; пустой список - попыток не осталось.
+        """
+        model = ArchivedAttempt if archived else UserAttempt
+        chunk = select(model.id).where(model.task_id == task_id).limit(limit)
+        async with self.async_session() as session:
+            result = await session.execute(
+                delete(model)
+                .where(model.id.in_(chunk))
+                .returning(model.user_id, model.is_correct)
+                .execution_options(synchronize_session=False)
+            )
+            rows = result.all()
+            await session.commit()
+        
+        for user_id, is_correct in rows:
+            if is_correct:
+                self.solved_cache.discard(user_id, task_id)
+        return rows
+
+    async def finish_task_purge(self, task_id: int) -> bool:
+        """Удалить строку задания и оставшиеся мелкие зависимости.
+
+        Строка удаляется, только если попыток по заданию больше нет
+        (неправильные ответы могли дописаться из буфера после прохода purge).
+        Баллы игроков и команд за задание сохраняются.
+        """
+        async with self.async_session() as session:
+            remaining = await session.scalar(
+                select(UserAttempt.id).where(UserAttempt.task_id == task_id).limit(1)
+            )
+            if remaining is not None:
+                return False
+            result = await session.execute(
+                delete(TeamSolve).where(TeamSolve.task_id == task_id).returning(TeamSolve.team_id)
+            )
+            team_ids = result.scalars().all()
+            await session.execute(delete(TaskStatsRecord).where(TaskStatsRecord.task_id == task_id))
+            await session.execute(
+                update(ScheduledAssignment)
+                .where(ScheduledAssignment.task_id == task_id)
+                .values(task_id=None)
+            )
+            await session.execute(
+                update(EventParticipant)
+                .where(EventParticipant.current_task_id == task_id)
+                .values(current_task_id=None)
+            )
+            result = await session.execute(
+                delete(Task).where(Task.id == task_id, Task.deleted_at.is_not(None))
+            )
+            await session.commit()
+        
+        # SQLite может выдать id удаленного задания новому - в кэшах его не должно остаться
+        for team_id in team_ids:
+            self.team_cache.discard_solved(team_id, task_id)
+        self.task_cache.remove(task_id)
+        return result.rowcount > 0
 
     # Attempt methods
     async def create_attempt(self, user_id: int, task_id: int, user_answer: str, is_correct: bool) -> UserAttempt:
         """Создать запись о попытке"""
         async with self.async_session() as session:
             attempt = UserAttempt(
+                event_id=self.active_event_id,
                 user_id=user_id,
                 task_id=task_id,
                 user_answer=user_answer,
@@ -159,17 +791,476 @@ class DatabaseManager:
             )
             session.add(attempt)
             await session.commit()
-            await session.refresh(attempt)
+            if is_correct:
+                self.solved_cache.add(user_id, task_id)
             return attempt
 
+    async def insert_attempts(self, attempts: List[dict], chunk_size: int = 500) -> None:
+        """Записать пакет попыток многострочными INSERT в одной транзакции"""
+        async with self.async_session() as session:
+            # Ограничиваем размер одного INSERT из-за лимита параметров SQLite
+            for start in range(0, len(attempts), chunk_size):
+                await session.execute(
+                    insert(UserAttempt).values(attempts[start:start + chunk_size])
+                )
+            await session.commit()
+        
+        for attempt in attempts:
+            if attempt['is_correct']:
+                self.solved_cache.add(attempt['user_id'], attempt['task_id'])
+
+    async def record_solve(self, user_id: int, task_id: int, user_answer: str,
+                           scoring: ScoringPolicy) -> Tuple[int, int]:
+        """Засчитать правильный ответ одной транзакцией.
+
+        Записывает попытку, увеличивает счетчик решивших, в динамическом режиме
+        пересчитывает баллы всех прежних решивших одним UPDATE, начисляет баллы
+        и закрывает текущее задание пользователя. Команде пользователя баллы
+        начисляются, только если задание решено ею впервые.
+        Возвращает (начислено баллов, новый счет).
+        """
+        previous_solvers = (
+            select(UserAttempt.user_id)
+            .where(
+                UserAttempt.task_id == task_id,
+                UserAttempt.is_correct == True,
+                UserAttempt.user_id != user_id
+            )
+        )
+        rebalanced = []
+        team_rows = []
+        team_solved = None
+        awarded = 0
+        solve_count = None
+        
+        async with self.async_session() as session:
+            already_solved = await session.scalar(
+                select(UserAttempt.id).where(
+                    UserAttempt.event_id == self.active_event_id,
+                    UserAttempt.user_id == user_id,
+                    UserAttempt.task_id == task_id,
+                    UserAttempt.is_correct == True
+                ).limit(1)
+            )
+            session.add(UserAttempt(
+                event_id=self.active_event_id,
+                user_id=user_id,
+                task_id=task_id,
+                user_answer=user_answer,
+                is_correct=True
+            ))
+            
+            if not already_solved:
+                result = await session.execute(
+                    update(Task)
+                    .where(Task.id == task_id)
+                    .values(solve_count=Task.solve_count + 1)
+                    .returning(Task.solve_count, Task.points)
+                )
+                solve_count, points = result.one()
+                awarded = scoring.value(points, solve_count)
+                
+                delta = awarded - scoring.value(points, solve_count - 1)
+                if solve_count > 1 and delta:
+                    # Стоимость задания изменилась - пересчитываем всех прежних решивших
+                    result = await session.execute(
+                        update(User)
+                        .where(User.id.in_(previous_solvers))
+                        .values(score=User.score + delta)
+                        .returning(*USER_STATE_COLUMNS)
+                        .execution_options(synchronize_session=False)
+                    )
+                    rebalanced = result.all()
+                    # Командам, уже решившим задание, стоимость меняется так же
+                    result = await session.execute(
+                        update(Team)
+                        .where(Team.id.in_(select(TeamSolve.team_id).where(TeamSolve.task_id == task_id)))
+                        .values(score=Team.score + delta)
+                        .returning(Team.id, Team.score)
+                        .execution_options(synchronize_session=False)
+                    )
+                    team_rows.extend(result.all())
+            
+            result = await session.execute(
+                update(User)
+                .where(User.id == user_id)
+                .values(score=User.score + awarded, can_get_task=False, current_task_id=None)
+                .returning(*USER_STATE_COLUMNS)
+            )
+            row = result.one()
+            
+            if row.team_id is not None:
+                # Уникальный индекс (team_id, task_id) гарантирует одно зачисление на команду
+                inserted = await session.scalar(
+                    self._upsert(TeamSolve)
+                    .values(team_id=row.team_id, task_id=task_id, user_id=user_id)
+                    .on_conflict_do_nothing(index_elements=[TeamSolve.team_id, TeamSolve.task_id])
+                    .returning(TeamSolve.id)
+                )
+                if inserted is not None:
+                    team_solved = row.team_id
+                    result = await session.execute(
+                        update(Team)
+                        .where(Team.id == row.team_id)
+                        .values(score=Team.score + awarded)
+                        .returning(Team.id, Team.score)
+                    )
+                    team_rows.extend(result.all())
+            await session.commit()
+        
+        cached_task = self.task_cache.get(task_id)
+        if cached_task is not None and solve_count is not None:
+            cached_task.solve_count = solve_count
+        for rebalanced_row in rebalanced:
+            self.user_cache.put(*rebalanced_row)
+        self.user_cache.put(*row)
+        self.solved_cache.add(user_id, task_id)
+        for team_id, team_score in team_rows:
+            self.team_cache.set_score(team_id, team_score)
+        if team_solved is not None:
+            self.team_cache.add_solved(team_solved, task_id)
+        return awarded, row.score
+
+    async def get_task_attempts_chunk(self, task_id: int, after_id: int, limit: int) -> list:
+        """Порция попыток по заданию (id, user_id, user_answer, is_correct, attempted_at) после after_id"""
+        # Архивные попытки тоже перепроверяются - после смены ответа они могут стать верными
+        stmt = union_all(*(
+            select(model.id.label('attempt_id'), model.user_id, model.user_answer,
+                   model.is_correct, model.attempted_at)
+            .where(model.task_id == task_id, model.id > after_id)
+            for model in (UserAttempt, ArchivedAttempt)
+        ))
+        async with self.async_session() as session:
+            result = await session.execute(
+                stmt.order_by(stmt.selected_columns[0]).limit(limit)
+            )
+            return result.all()
+
+    async def apply_regrade(self, task_id: int, correct_ids: List[int], incorrect_ids: List[int],
+                            scoring: ScoringPolicy, chunk_size: int = 500) -> dict:
+        """Применить результат перепроверки одной транзакцией.
+
+        Первым делом транзакция обновляет строку задания - так она
+        упорядочивается с record_solve по этому заданию. Решившие до и после,
+        число решивших и стоимость задания считаются уже внутри нее, поэтому
+        решения, пришедшие во время чтения попыток, не сбивают баллы.
+        Возвращает {'solve_count', 'gained': [user_id], 'revoked': [user_id]}.
+        """
+        solvers_query = (
+            select(UserAttempt.user_id)
+            .where(UserAttempt.task_id == task_id, UserAttempt.is_correct == True)
+            .distinct()
+        )
+        rows = []
+        async with self.async_session() as session:
+            result = await session.execute(
+                update(Task)
+                .where(Task.id == task_id)
+                .values(solve_count=Task.solve_count)
+                .returning(Task.solve_count, Task.points)
+            )
+            old_count, points = result.one()
+            before = set((await session.scalars(solvers_query)).all())
+            
+            # Верные попытки всегда живут в горячей таблице - возвращаем их из архива
+            for start in range(0, len(correct_ids), chunk_size):
+                chunk = correct_ids[start:start + chunk_size]
+                await session.execute(
+                    insert(UserAttempt).from_select(
+                        ATTEMPT_COLUMNS,
+                        select(*_attempt_columns(ArchivedAttempt)).where(ArchivedAttempt.id.in_(chunk))
+                    )
+                )
+                await session.execute(delete(ArchivedAttempt).where(ArchivedAttempt.id.in_(chunk)))
+            
+            for ids, is_correct in ((correct_ids, True), (incorrect_ids, False)):
+                for start in range(0, len(ids), chunk_size):
+                    await session.execute(
+                        update(UserAttempt)
+                        .where(UserAttempt.id.in_(ids[start:start + chunk_size]))
+                        .values(is_correct=is_correct)
+                        .execution_options(synchronize_session=False)
+                    )
+            
+            after = set((await session.scalars(solvers_query)).all())
+            gained = list(after - before)
+            revoked = list(before - after)
+            solve_count = len(after)
+            old_value = scoring.value(points, old_count or 0)
+            new_value = scoring.value(points, solve_count)
+            
+            score_deltas = {}
+            for delta, user_ids in ((new_value, gained), (-old_value, revoked),
+                                    (new_value - old_value, list(before & after))):
+                if delta and user_ids:
+                    score_deltas.setdefault(delta, []).extend(user_ids)
+            for delta, user_ids in score_deltas.items():
+                for start in range(0, len(user_ids), chunk_size):
+                    result = await session.execute(
+                        update(User)
+                        .where(User.id.in_(user_ids[start:start + chunk_size]))
+                        .values(score=User.score + delta)
+                        .returning(*USER_STATE_COLUMNS)
+                        .execution_options(synchronize_session=False)
+                    )
+                    rows.extend(result.all())
+            
+            await session.execute(
+                update(Task).where(Task.id == task_id).values(solve_count=solve_count)
+            )
+            team_rows, added_teams, removed_teams = await self._reconcile_team_solves(
+                session, task_id, old_value, new_value
+            )
+            await session.commit()
+        
+        for row in rows:
+            self.user_cache.put(*row)
+        for user_id in gained:
+            self.solved_cache.add(user_id, task_id)
+        for user_id in revoked:
+            self.solved_cache.discard(user_id, task_id)
+        for team_id, team_score in team_rows:
+            self.team_cache.set_score(team_id, team_score)
+        for team_id in added_teams:
+            self.team_cache.add_solved(team_id, task_id)
+        for team_id in removed_teams:
+            self.team_cache.discard_solved(team_id, task_id)
+        cached_task = self.task_cache.get(task_id)
+        if cached_task is not None:
+            cached_task.solve_count = solve_count
+        return {'solve_count': solve_count, 'gained': gained, 'revoked': revoked}
+
+    async def _reconcile_team_solves(self, session: AsyncSession, task_id: int,
+                                     old_value: int, new_value: int) -> Tuple[list, set, set]:
+        """Привести зачтения задания командам в соответствие с верными попытками.
+
+        Возвращает (новые счета команд, команды с новым зачтением, команды без зачтения).
+        """
+        old_teams = set((await session.scalars(
+            select(TeamSolve.team_id).where(TeamSolve.task_id == task_id)
+        )).all())
+        result = await session.execute(
+            select(User.team_id, UserAttempt.user_id)
+            .join(User, User.id == UserAttempt.user_id)
+            .where(UserAttempt.task_id == task_id, UserAttempt.is_correct == True,
+                   User.team_id.is_not(None))
+            .order_by(UserAttempt.id)
+        )
+        # Зачтение получает первый верно ответивший участник команды
+        solvers = {}
+        for team_id, user_id in result:
+            solvers.setdefault(team_id, user_id)
+        
+        added = solvers.keys() - old_teams
+        removed = old_teams - solvers.keys()
+        if removed:
+            await session.execute(
+                delete(TeamSolve).where(TeamSolve.task_id == task_id, TeamSolve.team_id.in_(removed))
+            )
+        if added:
+            await session.execute(insert(TeamSolve).values([
+                {'team_id': team_id, 'task_id': task_id, 'user_id': solvers[team_id]} for team_id in added
+            ]))
+        
+        team_deltas = {}
+        for team_id in old_teams | solvers.keys():
+            delta = (new_value if team_id in solvers else 0) - (old_value if team_id in old_teams else 0)
+            if delta:
+                team_deltas.setdefault(delta, []).append(team_id)
+        team_rows = []
+        for delta, team_ids in team_deltas.items():
+            result = await session.execute(
+                update(Team)
+                .where(Team.id.in_(team_ids))
+                .values(score=Team.score + delta)
+                .returning(Team.id, Team.score)
+                .execution_options(synchronize_session=False)
+            )
+            team_rows.extend(result.all())
+        return team_rows, added, removed
+
+    async def stream_attempts_export(self, partition_size: int = 1000) -> AsyncIterator[Sequence]:
+        """Попытки активного мероприятия (включая архив) с пользователем и заданием,
+        порциями через серверный курсор"""
+        stmt = union_all(*(
+            select(
+                model.id.label('attempt_id'), model.event_id, model.attempted_at,
+                User.telegram_id, User.username, User.full_name,
+                Task.id, Task.title,
+                model.user_answer, model.is_correct
+            )
+            .join(User, User.id == model.user_id)
+            .join(Task, Task.id == model.task_id)
+            .where(model.event_id == self.active_event_id)
+            for model in (UserAttempt, ArchivedAttempt)
+        ))
+        async with self.async_session() as session:
+            result = await session.stream(
+                stmt.order_by(stmt.selected_columns[0])
+                .execution_options(yield_per=partition_size)
+            )
+            async for partition in result.partitions():
+                yield partition
+
+    async def stream_scores_export(self, partition_size: int = 1000) -> AsyncIterator[Sequence]:
+        """Пользователи с баллами и числом решенных заданий активного мероприятия, порциями"""
+        solved_count = (
+            select(func.count(func.distinct(UserAttempt.task_id)))
+            .where(UserAttempt.event_id == self.active_event_id,
+                   UserAttempt.user_id == User.id, UserAttempt.is_correct == True)
+            .scalar_subquery()
+        )
+        async with self.async_session() as session:
+            result = await session.stream(
+                select(
+                    User.telegram_id, User.username, User.full_name,
+                    User.score, solved_count, User.created_at
+                )
+                .order_by(User.score.desc(), User.id)
+                .execution_options(yield_per=partition_size)
+            )
+            async for partition in result.partitions():
+                yield partition
+
+    async def stream_attempts_for_stats(self, partition_size: int = 5000) -> AsyncIterator[Sequence]:
+        """Все попытки, включая архив, (task_id, user_id, user_answer, is_correct, attempted_at) по порядку"""
+        stmt = union_all(*(
+            select(model.id, model.task_id, model.user_id, model.user_answer,
+                   model.is_correct, model.attempted_at)
+            for model in (UserAttempt, ArchivedAttempt)
+        ))
+        subquery = stmt.subquery()
+        async with self.async_session() as session:
+            result = await session.stream(
+                select(subquery.c.task_id, subquery.c.user_id, subquery.c.user_answer,
+                       subquery.c.is_correct, subquery.c.attempted_at)
+                .order_by(subquery.c.id)
+                .execution_options(yield_per=partition_size)
+            )
+            async for partition in result.partitions():
+                yield partition
+
+    async def load_task_stats(self) -> List[Tuple[int, str]]:
+        async with self.async_session() as session:
+            result = await session.execute(select(TaskStatsRecord.task_id, TaskStatsRecord.data))
+            return result.all()
+
+    async def save_task_stats(self, records: dict) -> None:
+        """Сохранить статистику заданий {task_id: data}"""
+        if not records:
+            return
+        stmt = self._upsert(TaskStatsRecord).values(
+            [{'task_id': task_id, 'data': data} for task_id, data in records.items()]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TaskStatsRecord.task_id],
+            set_={'data': stmt.excluded.data, 'updated_at': func.now()}
+        )
+        async with self.async_session() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    # Retention: архив старых попыток и постепенный VACUUM
+    async def enable_incremental_vacuum(self) -> bool:
+        """Перевести файл SQLite в режим auto_vacuum=INCREMENTAL.
+
+        Режим меняется только полным VACUUM, поэтому это делается один раз при старте.
+        Возвращает True, если режим был изменен.
+        """
+        if self.engine.dialect.name != 'sqlite':
+            return False
+        autocommit = self.engine.execution_options(isolation_level="AUTOCOMMIT")
+        async with autocommit.connect() as conn:
+            mode = await conn.scalar(text("PRAGMA auto_vacuum"))
+            if mode == 2:
+                return False
+            await conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+            await conn.execute(text("VACUUM"))
+        return True
+
+    async def incremental_vacuum(self, pages: int) -> int:
+        """Вернуть ОС до pages свободных страниц. Возвращает число освобожденных страниц"""
+        if self.engine.dialect.name != 'sqlite':
+            return 0
+        async with self.engine.begin() as conn:
+            before = await conn.scalar(text("PRAGMA freelist_count"))
+            if not before:
+                return 0
+            await conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(pages)})")
+            after = await conn.scalar(text("PRAGMA freelist_count"))
+        return before - after
+
+    async def get_last_attempt_time(self) -> Optional[datetime]:
+        async with self.async_session() as session:
+            return await session.scalar(
+                select(UserAttempt.attempted_at).order_by(UserAttempt.id.desc()).limit(1)
+            )
+
+    async def get_archive_boundary(self, older_than: datetime) -> Optional[int]:
+        """Максимальный id попытки старше older_than - граница для архивации"""
+        async with self.async_session() as session:
+            return await session.scalar(
+                select(func.max(UserAttempt.id)).where(UserAttempt.attempted_at < older_than)
+            )
+
+    async def archive_attempts_chunk(self, after_id: int, max_id: int, limit: int) -> Tuple[int, int]:
+        """Перенести в архив порцию неправильных попыток с id в (after_id, max_id].
+
+        Верные попытки остаются в горячей таблице: на них держатся проверки
+        "уже решено", счетчики решивших и перепроверка.
+        Возвращает (перенесено, последний просмотренный id); 0 во втором - попыток больше нет.
+        """
+        async with self.async_session() as session:
+            upper = await session.scalar(
+                select(func.max(UserAttempt.id)).where(
+                    UserAttempt.id.in_(
+                        select(UserAttempt.id)
+                        .where(UserAttempt.id > after_id, UserAttempt.id <= max_id,
+                               UserAttempt.is_correct == False)
+                        .order_by(UserAttempt.id)
+                        .limit(limit)
+                    )
+                )
+            )
+            if upper is None:
+                return 0, 0
+            
+            chunk = and_(UserAttempt.id > after_id, UserAttempt.id <= upper,
+                         UserAttempt.is_correct == False)
+            await session.execute(
+                insert(ArchivedAttempt).from_select(
+                    ATTEMPT_COLUMNS, select(*_attempt_columns(UserAttempt)).where(chunk)
+                )
+            )
+            result = await session.execute(
+                delete(UserAttempt).where(chunk).execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            return result.rowcount, upper
+
     async def get_user_attempts(self, user_id: int) -> List[UserAttempt]:
-        """Получить все попытки пользователя"""
+        """Получить все попытки пользователя в активном мероприятии"""
         async with self.async_session() as session:
             result = await session.execute(
-                select(UserAttempt).where(UserAttempt.user_id == user_id)
+                select(UserAttempt).where(
+                    UserAttempt.event_id == self.active_event_id,
+                    UserAttempt.user_id == user_id
+                )
             )
             return result.scalars().all()
 
+    async def count_user_solved(self, user_id: int) -> int:
+        """Число заданий, решенных пользователем в активном мероприятии"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(func.count(func.distinct(UserAttempt.task_id))).where(
+                    UserAttempt.event_id == self.active_event_id,
+                    UserAttempt.user_id == user_id,
+                    UserAttempt.is_correct == True
+                )
+            )
+            return result.scalar_one()
+
     async def has_user_solved_task(self, user_id: int, task_id: int) -> bool:
         """Проверить, решил ли пользователь задание"""
         async with self.async_session() as session:
@@ -196,7 +1287,9 @@ class DatabaseManager:
                 return "User not found"
             
             attempts_result = await session.execute(
-                select(UserAttempt).where(UserAttempt.user_id == user.id)
+                select(UserAttempt)
+                .where(UserAttempt.event_id == self.active_event_id, UserAttempt.user_id == user.id)
+                .order_by(UserAttempt.id)
             )
             attempts = attempts_result.scalars().all()
             
@@ -226,24 +1319,16 @@ class DatabaseManager:
             return debug_info
 
     async def set_user_current_task(self, telegram_id: int, task_id: Optional[int]) -> None:
-        async with self.async_session() as session:
-            try:
-                result = await session.execute(
-                    select(User).where(User.telegram_id == telegram_id)
-                )
-                user = result.scalar_one_or_none()
-                
-                if user:
-                    user.current_task_id = task_id
-                    await session.commit()
-                    if task_id:
-                        logging.info(f"Set current task {task_id} for user {telegram_id}")
-                    else:
-                        logging.info(f"Cleared current task for user {telegram_id}")
-            except Exception as e:
-                await session.rollback()
-                logging.error(f"Error setting user current task: {e}")
-                raise
+        try:
+            await self._update_user(telegram_id, current_task_id=task_id)
+        except Exception as e:
+            logging.error(f"Error setting user current task: {e}")
+            raise
+        
+        if task_id:
+            logging.info(f"Set current task {task_id} for user {telegram_id}")
+        else:
+            logging.info(f"Cleared current task for user {telegram_id}")
 
     async def get_user_current_task(self, telegram_id: int) -> Optional[Task]:
         async with self.async_session() as session:
@@ -254,12 +1339,23 @@ class DatabaseManager:
             
             if user and user.current_task_id:
                 task_result = await session.execute(
-                    select(Task).where(Task.id == user.current_task_id)
+                    select(Task).where(Task.id == user.current_task_id, Task.deleted_at.is_(None))
                 )
                 return task_result.scalar_one_or_none()
             return None
 
-    async def get_random_task_for_user(self, user_id: int) -> Optional[Task]:
+    async def get_random_task_for_user(self, user_id: int, team_id: Optional[int] = None) -> Optional[Task]:
+        # После прогрева все активные и решенные задания есть в памяти
+        if self.task_cache.complete and self.solved_cache.complete and self.team_cache.complete:
+            # Задания, уже засчитанные команде, участникам не выдаются
+            exclude = self.solved_cache.get(user_id) | self.team_cache.solved(team_id)
+            task = self.task_cache.random_active(exclude=exclude)
+            if task:
+                logging.info(f"Found random task for user {user_id}: {task.title}")
+            else:
+                logging.info(f"No available tasks for user {user_id}")
+            return task
+        
         async with self.async_session() as session:
             try:
                 # Получаем пользователя
@@ -274,20 +1370,25 @@ class DatabaseManager:
                 # Получаем ID заданий, которые пользователь уже решал правильно
                 solved_tasks_subquery = select(UserAttempt.task_id).where(
                     and_(
+                        UserAttempt.event_id == self.active_event_id,
                         UserAttempt.user_id == user_id,
                         UserAttempt.is_correct == True
                     )
                 ).scalar_subquery()
 
                 # Получаем случайное активное задание, которое пользователь еще не решал
-                result = await session.execute(
-                    select(Task).where(
-                        and_(
-                            Task.is_active == True,
-                            not_(Task.id.in_(solved_tasks_subquery))
-                        )
-                    ).order_by(func.random()).limit(1)
+                query = select(Task).where(
+                    and_(
+                        Task.event_id == self.active_event_id,
+                        Task.is_active == True,
+                        not_(Task.id.in_(solved_tasks_subquery))
+                    )
                 )
+                if team_id is not None:
+                    query = query.where(
+                        not_(Task.id.in_(select(TeamSolve.task_id).where(TeamSolve.team_id == team_id)))
+                    )
+                result = await session.execute(query.order_by(func.random()).limit(1))
                 task = result.scalar_one_or_none()
                 
                 if task:
@@ -302,10 +1403,14 @@ class DatabaseManager:
             
     async def has_user_solved_task(self, user_id: int, task_id: int) -> bool:
         """Проверить, решил ли пользователь задание"""
+        if self.solved_cache.complete:
+            return self.solved_cache.has(user_id, task_id)
+        
         async with self.async_session() as session:
             result = await session.execute(
                 select(UserAttempt).where(
                     and_(
+                        UserAttempt.event_id == self.active_event_id,
                         UserAttempt.user_id == user_id,
                         UserAttempt.task_id == task_id,
                         UserAttempt.is_correct == True
@@ -313,3 +1418,276 @@ class DatabaseManager:
                 )
             )
             return result.scalar_one_or_none() is not None
+
+    # Round schedule methods
+    async def create_round_schedule(self, starts_at: datetime, min_score: Optional[int] = None,
+                                    only_solved: bool = False) -> RoundSchedule:
+        """Запланировать раунд (starts_at в UTC)"""
+        async with self.async_session() as session:
+            schedule = RoundSchedule(
+                starts_at=starts_at,
+                min_score=min_score,
+                only_solved=only_solved
+            )
+            session.add(schedule)
+            await session.commit()
+            return schedule
+
+    async def get_pending_schedules(self) -> List[RoundSchedule]:
+        """Незавершенные раунды в порядке времени старта"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(RoundSchedule)
+                .where(RoundSchedule.status.in_(("pending", "prepared")))
+                .order_by(RoundSchedule.starts_at)
+            )
+            return result.scalars().all()
+
+    async def cancel_round_schedule(self, schedule_id: int) -> bool:
+        """Отменить раунд, если он еще не начался"""
+        async with self.async_session() as session:
+            result = await session.execute(
+                update(RoundSchedule)
+                .where(
+                    RoundSchedule.id == schedule_id,
+                    RoundSchedule.status.in_(("pending", "prepared"))
+                )
+                .values(status="cancelled")
+            )
+            await session.execute(
+                delete(ScheduledAssignment).where(ScheduledAssignment.schedule_id == schedule_id)
+            )
+            await session.commit()
+            return result.rowcount > 0
+
+    async def prepare_round_assignments(self, schedule: RoundSchedule, chunk_size: int = 500) -> int:
+        """Заранее выбрать следующее задание каждому участнику раунда и сохранить выбор"""
+        users_query = select(User.id, User.current_task_id, User.team_id)
+        if schedule.min_score is not None:
+            users_query = users_query.where(User.score >= schedule.min_score)
+        if schedule.only_solved:
+            users_query = users_query.where(User.can_get_task == False)
+        
+        use_cache = self.task_cache.complete and self.solved_cache.complete and self.team_cache.complete
+        assignments = []
+        async with self.async_session() as session:
+            users = await session.stream(users_query)
+            async for user_id, current_task_id, team_id in users:
+                if use_cache:
+                    # Текущее задание исключаем: его могут решить до начала раунда
+                    exclude = (self.solved_cache.get(user_id) | self.team_cache.solved(team_id)
+                               | {current_task_id})
+                    task = self.task_cache.random_active(exclude=exclude)
+                else:
+                    task = await self.get_random_task_for_user(user_id, team_id)
+                assignments.append({
+                    'schedule_id': schedule.id,
+                    'user_id': user_id,
+                    'task_id': task.id if task else None
+                })
+        
+        async with self.async_session() as session:
+            await session.execute(
+                delete(ScheduledAssignment).where(ScheduledAssignment.schedule_id == schedule.id)
+            )
+            for start in range(0, len(assignments), chunk_size):
+                await session.execute(
+                    insert(ScheduledAssignment).values(assignments[start:start + chunk_size])
+                )
+            await session.execute(
+                update(RoundSchedule)
+                .where(RoundSchedule.id == schedule.id)
+                .values(status="prepared")
+            )
+            await session.commit()
+        
+        return len(assignments)
+
+    async def apply_round_assignments(self, schedule_id: int) -> List[Tuple[int, Optional[int]]]:
+        """Назначить подготовленные задания одной транзакцией.
+
+        Возвращает пары (telegram_id, task_id) участников раунда.
+        """
+        assigned_task = (
+            select(ScheduledAssignment.task_id)
+            .where(
+                ScheduledAssignment.schedule_id == schedule_id,
+                ScheduledAssignment.user_id == User.id
+            )
+            .scalar_subquery()
+        )
+        participants = select(ScheduledAssignment.user_id).where(
+            ScheduledAssignment.schedule_id == schedule_id
+        )
+        
+        async with self.async_session() as session:
+            result = await session.execute(
+                update(User)
+                .where(User.id.in_(participants))
+                .values(can_get_task=True, current_task_id=assigned_task)
+                .returning(*USER_STATE_COLUMNS)
+                .execution_options(synchronize_session=False)
+            )
+            rows = result.all()
+            await session.execute(
+                update(RoundSchedule)
+                .where(RoundSchedule.id == schedule_id)
+                .values(status="done")
+            )
+            await session.execute(
+                delete(ScheduledAssignment).where(ScheduledAssignment.schedule_id == schedule_id)
+            )
+            await session.commit()
+        
+        for row in rows:
+            self.user_cache.put(*row)
+        return [(row.telegram_id, row.current_task_id) for row in rows]
+
+    # Team methods
+    async def _load_teams(self, session: AsyncSession) -> int:
+        """Загрузить команды с числом участников и зачтенные задания в кэш"""
+        members = (
+            select(func.count(User.id))
+            .where(User.team_id == Team.id)
+            .scalar_subquery()
+        )
+        result = await session.execute(select(Team.id, Team.name, Team.score, members))
+        teams = result.all()
+        for team in teams:
+            self.team_cache.put(*team)
+        
+        solved = {}
+        event_tasks = select(Task.id).where(Task.event_id == self.active_event_id)
+        result = await session.stream(
+            select(TeamSolve.team_id, TeamSolve.task_id).where(TeamSolve.task_id.in_(event_tasks))
+        )
+        async for team_id, task_id in result:
+            solved.setdefault(team_id, set()).add(task_id)
+        self.team_cache.set_solved(solved)
+        self.team_cache.complete = True
+        return len(teams)
+
+    async def create_team(self, name: str) -> Optional[Team]:
+        """Создать команду. None, если команда с таким названием уже есть"""
+        if self.team_cache.find(name):
+            return None
+        async with self.async_session() as session:
+            team = Team(name=name)
+            session.add(team)
+            try:
+                await session.commit()
+            except IntegrityError:
+                return None
+        self.team_cache.put(team.id, team.name, team.score or 0)
+        return team
+
+    async def set_user_team(self, telegram_id: int, team_id: Optional[int]) -> None:
+        """Перевести пользователя в команду (None - выйти из команды)"""
+        state = self.user_cache.get(telegram_id)
+        old_team_id = state.team_id if state else await self._get_user_team_id(telegram_id)
+        await self._update_user(telegram_id, team_id=team_id)
+        self.team_cache.move_member(old_team_id, team_id)
+
+    async def _get_user_team_id(self, telegram_id: int) -> Optional[int]:
+        async with self.async_session() as session:
+            return await session.scalar(select(User.team_id).where(User.telegram_id == telegram_id))
+
+    # Event methods
+    async def get_events(self) -> list:
+        """Мероприятия с числом заданий: (id, name, is_active, tasks)"""
+        tasks = (
+            select(func.count(Task.id))
+            .where(Task.event_id == Event.id, Task.deleted_at.is_(None))
+            .scalar_subquery()
+        )
+        async with self.async_session() as session:
+            result = await session.execute(
+                select(Event.id, Event.name, Event.is_active, tasks).order_by(Event.id)
+            )
+            return result.all()
+
+    async def create_event(self, name: str) -> Optional[Event]:
+        """Создать мероприятие. None, если такое название уже есть"""
+        async with self.async_session() as session:
+            event = Event(name=name)
+            session.add(event)
+            try:
+                await session.commit()
+            except IntegrityError:
+                return None
+        return event
+
+    async def switch_event(self, event_id: int) -> Optional[dict]:
+        """Сделать мероприятие активным одной транзакцией.
+
+        Прогресс игроков (score, can_get_task, current_task_id) и счет команд
+        текущего мероприятия сохраняются в event_participants и event_team_scores,
+        а в users и teams загружается сохраненный прогресс нового; у тех, кто
+        в нем не участвовал, - начальные значения. Подготовленные назначения
+        раундов сбрасываются, раунды готовятся заново из заданий нового мероприятия.
+        Затем кэши прогреваются заново. None, если мероприятия нет.
+        """
+        old_event_id = self.active_event_id
+        # Сохраняем только тех, чье состояние отличается от начального
+        has_progress = or_(User.score != 0, User.can_get_task == False, User.current_task_id.is_not(None))
+        saved = (
+            select(EventParticipant)
+            .where(EventParticipant.event_id == event_id, EventParticipant.user_id == User.id)
+        )
+        saved_team = (
+            select(EventTeamScore.score)
+            .where(EventTeamScore.event_id == event_id, EventTeamScore.team_id == Team.id)
+            .scalar_subquery()
+        )
+        
+        async with self.async_session() as session:
+            if await session.scalar(select(Event.id).where(Event.id == event_id)) is None:
+                return None
+            
+            await session.execute(delete(EventParticipant).where(EventParticipant.event_id == old_event_id))
+            result = await session.execute(
+                insert(EventParticipant).from_select(
+                    ['event_id', 'user_id', 'score', 'can_get_task', 'current_task_id'],
+                    select(literal(old_event_id), User.id, User.score, User.can_get_task, User.current_task_id)
+                    .where(has_progress)
+                )
+            )
+            saved_users = result.rowcount
+            await session.execute(delete(EventTeamScore).where(EventTeamScore.event_id == old_event_id))
+            await session.execute(
+                insert(EventTeamScore).from_select(
+                    ['event_id', 'team_id', 'score'],
+                    select(literal(old_event_id), Team.id, Team.score).where(Team.score != 0)
+                )
+            )
+            
+            await session.execute(
+                update(User).values(
+                    score=func.coalesce(saved.with_only_columns(EventParticipant.score).scalar_subquery(), 0),
+                    can_get_task=func.coalesce(
+                        saved.with_only_columns(EventParticipant.can_get_task).scalar_subquery(), True
+                    ),
+                    current_task_id=saved.with_only_columns(EventParticipant.current_task_id).scalar_subquery()
+                ).execution_options(synchronize_session=False)
+            )
+            await session.execute(
+                update(Team).values(score=func.coalesce(saved_team, 0)).execution_options(synchronize_session=False)
+            )
+            restored_users = await session.scalar(
+                select(func.count()).select_from(EventParticipant).where(EventParticipant.event_id == event_id)
+            )
+            
+            await session.execute(delete(ScheduledAssignment))
+            await session.execute(
+                update(RoundSchedule).where(RoundSchedule.status == "prepared").values(status="pending")
+            )
+            await session.execute(update(Event).values(is_active=Event.id == event_id))
+            await session.commit()
+        
+        self.active_event_id = event_id
+        self.user_cache.clear()
+        self.task_cache = TaskCache(event_id)
+        self.solved_cache = SolvedTasksCache()
+        self.team_cache = TeamCache()
+        warmed = await self.warm_up()
+        return {'saved_users': saved_users, 'restored_users': restored_users or 0, **warmed}
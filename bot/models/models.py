@@ -1,5 +1,5 @@
 # bot/models/models.py
-from sqlalchemy import String, Integer, Boolean, Text, DateTime, ForeignKey, BigInteger
+from sqlalchemy import String, Integer, Boolean, Text, DateTime, ForeignKey, BigInteger, UniqueConstraint, Index
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -8,6 +8,34 @@ from typing import Optional, List
 class Base(DeclarativeBase):
     pass
 
+# Мероприятие: свои задания, попытки и прогресс участников.
+# Активно ровно одно, его прогресс лежит прямо в users и teams
+class Event(Base):
+    __tablename__ = "events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=False, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+# Сохраненный прогресс игрока в неактивном мероприятии
+class EventParticipant(Base):
+    __tablename__ = "event_participants"
+
+    event_id: Mapped[int] = mapped_column(Integer, ForeignKey("events.id"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), primary_key=True)
+    score: Mapped[int] = mapped_column(Integer, default=0)
+    can_get_task: Mapped[bool] = mapped_column(Boolean, default=True)
+    current_task_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("tasks.id"))
+
+# Сохраненный счет команды в неактивном мероприятии
+class EventTeamScore(Base):
+    __tablename__ = "event_team_scores"
+
+    event_id: Mapped[int] = mapped_column(Integer, ForeignKey("events.id"), primary_key=True)
+    team_id: Mapped[int] = mapped_column(Integer, ForeignKey("teams.id"), primary_key=True)
+    score: Mapped[int] = mapped_column(Integer, default=0)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -18,28 +46,68 @@ class User(Base):
     score: Mapped[int] = mapped_column(Integer, default=0)
     current_task_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("tasks.id"))
     can_get_task: Mapped[bool] = mapped_column(Boolean, default=True)
+    team_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("teams.id"), index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     attempts: Mapped[List["UserAttempt"]] = relationship("UserAttempt", back_populates="user")
 
+class Team(Base):
+    __tablename__ = "teams"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    # Сумма стоимостей решенных командой заданий, поддерживается инкрементально
+    score: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+# Задание засчитывается команде один раз - первому решившему участнику
+class TeamSolve(Base):
+    __tablename__ = "team_solves"
+    __table_args__ = (UniqueConstraint("team_id", "task_id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    team_id: Mapped[int] = mapped_column(Integer, ForeignKey("teams.id"), nullable=False)
+    task_id: Mapped[int] = mapped_column(Integer, ForeignKey("tasks.id"), nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    solved_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_event_active", "event_id", "is_active"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    event_id: Mapped[int] = mapped_column(Integer, ForeignKey("events.id"), nullable=False)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=False)
     image_url: Mapped[Optional[str]] = mapped_column(String(500))
     correct_answer: Mapped[str] = mapped_column(String(500), nullable=False)
     points: Mapped[int] = mapped_column(Integer, default=10)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Число решивших, поддерживается инкрементально при каждом решении
+    solve_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # Растет при каждом изменении задания, используется как ключ кэша отрисовки
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    # Мягкое удаление: задание скрыто сразу, строки удаляет фоновая очистка
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     attempts: Mapped[List["UserAttempt"]] = relationship("UserAttempt", back_populates="task")
 
 class UserAttempt(Base):
     __tablename__ = "user_attempts"
+    __table_args__ = (
+        # Покрывает выборки по игроку в активном мероприятии и прогрев решенных
+        Index("ix_user_attempts_event_user_task", "event_id", "user_id", "task_id", "is_correct"),
+        # Задание принадлежит одному мероприятию, поэтому task_id уже ключ раздела
+        Index("ix_user_attempts_task_correct", "task_id", "is_correct"),
+        # id не переиспользуются после архивации последних строк: архив хранит те же id
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    event_id: Mapped[int] = mapped_column(Integer, ForeignKey("events.id"), nullable=False)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
     task_id: Mapped[int] = mapped_column(Integer, ForeignKey("tasks.id"), nullable=False)
     user_answer: Mapped[str] = mapped_column(Text, nullable=False)
@@ -47,4 +115,48 @@ class UserAttempt(Base):
     attempted_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     user: Mapped["User"] = relationship("User", back_populates="attempts")
-    task: Mapped["Task"] = relationship("Task", back_populates="attempts")
\ No newline at end of file
+    task: Mapped["Task"] = relationship("Task", back_populates="attempts")
+
+class RoundSchedule(Base):
+    __tablename__ = "round_schedules"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Время старта хранится в UTC
+    starts_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    # pending -> prepared -> done, либо cancelled
+    status: Mapped[str] = mapped_column(String(20), default="pending", index=True)
+    min_score: Mapped[Optional[int]] = mapped_column(Integer)
+    only_solved: Mapped[bool] = mapped_column(Boolean, default=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+class ScheduledAssignment(Base):
+    __tablename__ = "scheduled_assignments"
+    __table_args__ = (UniqueConstraint("schedule_id", "user_id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    schedule_id: Mapped[int] = mapped_column(Integer, ForeignKey("round_schedules.id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    # None - у пользователя не осталось нерешенных заданий
+    task_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("tasks.id"))
+
+class TaskStatsRecord(Base):
+    __tablename__ = "task_stats"
+
+    task_id: Mapped[int] = mapped_column(Integer, ForeignKey("tasks.id"), primary_key=True)
+    # Сериализованные счетчики TaskStats
+    data: Mapped[str] = mapped_column(Text, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+# Старые неправильные попытки, вынесенные из горячей таблицы user_attempts
+class ArchivedAttempt(Base):
+    __tablename__ = "user_attempts_archive"
+
+    # id сохраняется из user_attempts, чтобы общий порядок попыток не менялся
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    event_id: Mapped[Optional[int]] = mapped_column(Integer)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    task_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    user_answer: Mapped[str] = mapped_column(Text, nullable=False)
+    is_correct: Mapped[bool] = mapped_column(Boolean, default=False)
+    attempted_at: Mapped[datetime] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
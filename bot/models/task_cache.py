@@ -0,0 +1,68 @@
+# bot/models/task_cache.py
+import random
+from typing import Dict, Iterable, Optional, Set
+
+from .models import Task
+
+
+class TaskCache:
+    """Кэш заданий по id.
+
+    После прогрева (complete=True) в кэше гарантированно есть все активные
+    задания, поэтому выбор случайного задания не требует запроса к БД.
+    Выдаются только задания мероприятия event_id, остальные лишь хранятся по id.
+    """
+
+    def __init__(self, event_id: Optional[int] = None):
+        self._tasks: Dict[int, Task] = {}
+        self._active_ids: Set[int] = set()
+        self.event_id = event_id
+        self.complete = False
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def get(self, task_id: int) -> Optional[Task]:
+        return self._tasks.get(task_id)
+
+    def put(self, task: Task) -> None:
+        self._tasks[task.id] = task
+        if task.is_active and task.event_id == self.event_id:
+            self._active_ids.add(task.id)
+        else:
+            self._active_ids.discard(task.id)
+
+    def remove(self, task_id: int) -> None:
+        self._tasks.pop(task_id, None)
+        self._active_ids.discard(task_id)
+
+    def random_active(self, exclude: Iterable[int] = ()) -> Optional[Task]:
+        candidates = list(self._active_ids.difference(exclude))
+        if not candidates:
+            return None
+        return self._tasks[random.choice(candidates)]
+
+
+class SolvedTasksCache:
+    """Множества решенных заданий по user_id (users.id, не telegram_id)"""
+
+    def __init__(self):
+        self._solved: Dict[int, Set[int]] = {}
+        self.complete = False
+
+    def __len__(self) -> int:
+        return len(self._solved)
+
+    def get(self, user_id: int) -> Set[int]:
+        return self._solved.get(user_id, set())
+
+    def add(self, user_id: int, task_id: int) -> None:
+        self._solved.setdefault(user_id, set()).add(task_id)
+
+    def discard(self, user_id: int, task_id: int) -> None:
+        solved = self._solved.get(user_id)
+        if solved:
+            solved.discard(task_id)
+
+    def has(self, user_id: int, task_id: int) -> bool:
+        return task_id in self._solved.get(user_id, ())
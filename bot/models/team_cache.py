@@ -0,0 +1,89 @@
+# bot/models/team_cache.py
+from typing import Dict, List, Optional, Set
+
+
+class TeamState:
+    __slots__ = ("id", "name", "score", "members")
+
+    def __init__(self, id: int, name: str, score: int, members: int = 0):
+        self.id = id
+        self.name = name
+        self.score = score
+        self.members = members
+
+    def __repr__(self) -> str:
+        return f"TeamState(id={self.id}, name={self.name!r}, score={self.score})"
+
+
+class TeamCache:
+    """Команды, их счет и решенные задания в памяти.
+
+    Счет меняется только вместе с транзакцией в БД, поэтому чтение
+    счета команды - O(1), а отсортированная таблица лидеров
+    пересобирается лишь после изменения счета.
+    """
+
+    def __init__(self):
+        self._teams: Dict[int, TeamState] = {}
+        self._by_name: Dict[str, int] = {}
+        self._solved: Dict[int, Set[int]] = {}
+        self._leaderboard: Optional[List[TeamState]] = None
+        self.complete = False
+
+    def __len__(self) -> int:
+        return len(self._teams)
+
+    def get(self, team_id: Optional[int]) -> Optional[TeamState]:
+        if team_id is None:
+            return None
+        return self._teams.get(team_id)
+
+    def find(self, name: str) -> Optional[TeamState]:
+        team_id = self._by_name.get(name.strip().lower())
+        return self._teams.get(team_id) if team_id is not None else None
+
+    def put(self, id: int, name: str, score: int, members: int = 0) -> TeamState:
+        team = TeamState(id, name, score or 0, members)
+        self._teams[id] = team
+        self._by_name[name.lower()] = id
+        self._leaderboard = None
+        return team
+
+    def set_score(self, team_id: int, score: int) -> None:
+        team = self._teams.get(team_id)
+        if team is not None and team.score != score:
+            team.score = score
+            self._leaderboard = None
+
+    def move_member(self, old_team_id: Optional[int], new_team_id: Optional[int]) -> None:
+        for team_id, delta in ((old_team_id, -1), (new_team_id, 1)):
+            team = self.get(team_id)
+            if team is not None:
+                team.members += delta
+
+    def solved(self, team_id: Optional[int]) -> Set[int]:
+        if team_id is None:
+            return set()
+        return self._solved.get(team_id, set())
+
+    def add_solved(self, team_id: int, task_id: int) -> None:
+        self._solved.setdefault(team_id, set()).add(task_id)
+
+    def discard_solved(self, team_id: int, task_id: int) -> None:
+        solved = self._solved.get(team_id)
+        if solved:
+            solved.discard(task_id)
+
+    def set_solved(self, solved: Dict[int, Set[int]]) -> None:
+        self._solved = solved
+
+    def leaderboard(self, limit: Optional[int] = None) -> List[TeamState]:
+        if self._leaderboard is None:
+            self._leaderboard = sorted(self._teams.values(), key=lambda team: (-team.score, team.id))
+        return self._leaderboard[:limit] if limit else list(self._leaderboard)
+
+    def place(self, team_id: int) -> Optional[int]:
+        for place, team in enumerate(self.leaderboard(), start=1):
+            if team.id == team_id:
+                return place
+        return None
@@ -0,0 +1,89 @@
+# bot/models/user_cache.py
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from .models import User
+
+# Примерный размер одной записи в кэше вместе с накладными расходами словаря
+ENTRY_SIZE_BYTES = 320
+
+
+class UserState:
+    """Компактное состояние пользователя без ORM"""
+
+    __slots__ = ("id", "telegram_id", "username", "score",
+                 "can_get_task", "current_task_id", "team_id", "full_name", "expires_at")
+
+    def __init__(self, id: int, telegram_id: int, username: Optional[str], score: int,
+                 can_get_task: bool, current_task_id: Optional[int], team_id: Optional[int] = None,
+                 full_name: Optional[str] = None, expires_at: float = 0.0):
+        self.id = id
+        self.telegram_id = telegram_id
+        self.username = username
+        self.score = score
+        self.can_get_task = can_get_task
+        self.current_task_id = current_task_id
+        self.team_id = team_id
+        self.full_name = full_name
+        self.expires_at = expires_at
+
+    def __repr__(self) -> str:
+        return f"UserState(id={self.id}, telegram_id={self.telegram_id}, score={self.score})"
+
+
+class UserStateCache:
+    """LRU-кэш состояния пользователей по telegram_id с TTL и ограничением памяти"""
+
+    def __init__(self, max_memory_mb: float = 64, ttl: float = 3600):
+        self.max_entries = max(1, int(max_memory_mb * 1024 * 1024 // ENTRY_SIZE_BYTES))
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, UserState]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, telegram_id: int) -> Optional[UserState]:
+        state = self._entries.get(telegram_id)
+        if state is None:
+            self.misses += 1
+            return None
+        if state.expires_at < time.monotonic():
+            del self._entries[telegram_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(telegram_id)
+        self.hits += 1
+        return state
+
+    def put(self, id: int, telegram_id: int, username: Optional[str], score: int,
+            can_get_task: bool, current_task_id: Optional[int],
+            team_id: Optional[int] = None, full_name: Optional[str] = None) -> UserState:
+        state = UserState(id, telegram_id, username, score or 0,
+                          bool(can_get_task), current_task_id, team_id, full_name,
+                          time.monotonic() + self.ttl)
+        self._entries[telegram_id] = state
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return state
+
+    def put_user(self, user: User) -> UserState:
+        return self.put(user.id, user.telegram_id, user.username, user.score,
+                        user.can_get_task, user.current_task_id, user.team_id, user.full_name)
+
+    def update(self, telegram_id: int, **fields: Any) -> None:
+        """Обновить поля записи, если пользователь есть в кэше"""
+        state = self._entries.get(telegram_id)
+        if state is None:
+            return
+        for key, value in fields.items():
+            setattr(state, key, value)
+
+    def invalidate(self, telegram_id: int) -> None:
+        self._entries.pop(telegram_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
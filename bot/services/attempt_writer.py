@@ -0,0 +1,91 @@
+# bot/services/attempt_writer.py
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+
+from bot.models.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class AttemptWriter:
+    """Отложенная пакетная запись неправильных попыток.
+
+    Попытки копятся в памяти и пишутся одним многострочным INSERT,
+    когда набирается batch_size записей или проходит flush_interval секунд.
+    """
+
+    def __init__(self, db: DatabaseManager, batch_size: int = 200,
+                 flush_interval: float = 1.0, max_pending: int = 10000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: List[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._background_flushes: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def add(self, user_id: int, task_id: int, user_answer: str) -> None:
+        self._pending.append({
+            # Мероприятие фиксируем в момент ответа: до записи его могут переключить
+            'event_id': self.db.active_event_id,
+            'user_id': user_id,
+            'task_id': task_id,
+            'user_answer': user_answer,
+            'is_correct': False,
+            # Время фиксируем сразу, а не в момент записи пакета
+            'attempted_at': datetime.now(timezone.utc).replace(tzinfo=None)
+        })
+        if len(self._pending) >= self.max_pending:
+            # Буфер переполнен - пишем прямо сейчас, притормаживая обработчик
+            await self.flush()
+        elif len(self._pending) >= self.batch_size and not self._flush_lock.locked():
+            flush_task = asyncio.create_task(self.flush())
+            self._background_flushes.add(flush_task)
+            flush_task.add_done_callback(self._background_flushes.discard)
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, []
+            try:
+                await self.db.insert_attempts(batch)
+            except Exception as e:
+                # Возвращаем пакет в начало очереди, чтобы не потерять ответы
+                self._pending[:0] = batch
+                logger.error(f"Failed to flush {len(batch)} attempts: {e}")
+                overflow = len(self._pending) - self.max_pending
+                if overflow > 0:
+                    # БД недоступна долго - память важнее самых старых неправильных ответов
+                    del self._pending[:overflow]
+                    logger.warning(f"Attempt buffer overflow, dropped {overflow} oldest attempts")
+                return 0
+            return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self) -> None:
+        """Остановить фоновую запись и сбросить все накопленные попытки"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        flushed = await self.flush()
+        logger.info(f"Attempt writer closed, flushed {flushed} attempts")
@@ -0,0 +1,184 @@
+# bot/services/backup.py
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+
+class BackupRestarted(Exception):
+    """Пошаговое копирование не успевает за записью в базу"""
+
+
+class BackupSkipped(Exception):
+    """Копия пропущена: база меняется слишком часто для пошагового копирования"""
+
+
+@dataclass
+class BackupResult:
+    path: Path
+    size: int
+    pages: int
+    elapsed: float
+    single_step: bool
+
+
+def sqlite_path(database_url: str) -> Optional[str]:
+    """Путь к файлу SQLite из DATABASE_URL или None для других БД и :memory:"""
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    return url.database
+
+
+class BackupService:
+    """Онлайн-копии SQLite через backup API без остановки бота.
+
+    В режиме WAL чтение не мешает записи, и база копируется одним шагом.
+    Иначе копирование идет в отдельном потоке по pages_per_step страниц
+    с паузой step_sleep между шагами, так что обработчики успевают писать
+    в базу. Если копирование перезапускается больше max_restarts раз,
+    оно повторяется через retry_delay, 2 * retry_delay, ... до retries раз,
+    а затем копия пропускается: копирование одним шагом без WAL
+    заблокировало бы запись на все время копирования.
+    Снимок пишется во временный файл, проверяется и только потом
+    атомарно переименовывается; хранятся последние keep снимков.
+    """
+
+    def __init__(self, database_path: str, backup_dir: str, interval: float = 3600,
+                 keep: int = 24, pages_per_step: int = 256, step_sleep: float = 0.01,
+                 max_restarts: int = 5, retries: int = 3, retry_delay: float = 5.0):
+        self.database_path = database_path
+        self.backup_dir = Path(backup_dir)
+        self.interval = interval
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.max_restarts = max_restarts
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.prefix = Path(database_path).stem + "-"
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.last_result: Optional[BackupResult] = None
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def backup(self) -> BackupResult:
+        # Два снимка одновременно только удвоят нагрузку на диск
+        async with self._lock:
+            result = await asyncio.to_thread(self._backup)
+            removed = await asyncio.to_thread(self._rotate)
+        self.last_result = result
+        logger.info(
+            f"Backup {result.path.name}: {result.pages} pages, {result.size} bytes "
+            f"in {result.elapsed:.2f}s{' (single step)' if result.single_step else ''}, "
+            f"rotated {len(removed)}"
+        )
+        return result
+
+    def snapshots(self) -> List[Path]:
+        return sorted(self.backup_dir.glob(f"{self.prefix}*.db"))
+
+    def _backup(self) -> BackupResult:
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        started_at = time.perf_counter()
+        name = f"{self.prefix}{datetime.now().strftime('%Y%m%d-%H%M%S')}.db"
+        final_path = self.backup_dir / name
+        temp_path = self.backup_dir / f".{name}.tmp"
+
+        source = sqlite3.connect(f"file:{self.database_path}?mode=ro", uri=True)
+        target = sqlite3.connect(temp_path)
+        try:
+            single_step = source.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            if single_step:
+                # Снимок читается одной транзакцией, писатели дописывают WAL параллельно
+                source.backup(target, pages=-1)
+            else:
+                self._backup_steps(source, target)
+
+            check = target.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise sqlite3.DatabaseError(f"Backup integrity check failed: {check}")
+            pages = target.execute("PRAGMA page_count").fetchone()[0]
+        except BaseException:
+            target.close()
+            temp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            source.close()
+        target.close()
+
+        os.replace(temp_path, final_path)
+        return BackupResult(
+            path=final_path,
+            size=final_path.stat().st_size,
+            pages=pages,
+            elapsed=time.perf_counter() - started_at,
+            single_step=single_step
+        )
+
+    def _backup_steps(self, source: sqlite3.Connection, target: sqlite3.Connection) -> None:
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            try:
+                source.backup(target, pages=self.pages_per_step,
+                              progress=self._progress_guard(), sleep=self.step_sleep)
+                return
+            except BackupRestarted:
+                logger.info(f"Backup restarted by concurrent writes (attempt {attempt + 1})")
+        raise BackupSkipped(f"database kept changing during {self.retries + 1} backup attempts")
+
+    def _progress_guard(self):
+        state = {'remaining': None, 'restarts': 0}
+
+        def progress(status: int, remaining: int, total: int) -> None:
+            # Рост оставшихся страниц - SQLite начал копирование заново после записи в базу
+            if state['remaining'] is not None and remaining > state['remaining']:
+                state['restarts'] += 1
+                if state['restarts'] > self.max_restarts:
+                    raise BackupRestarted()
+            state['remaining'] = remaining
+
+        return progress
+
+    def _rotate(self) -> List[Path]:
+        snapshots = self.snapshots()
+        removed = snapshots[:-self.keep] if self.keep > 0 else []
+        for path in removed:
+            path.unlink(missing_ok=True)
+        return removed
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.backup()
+            except BackupSkipped as e:
+                logger.warning(f"Scheduled backup skipped: {e}")
+            except Exception as e:
+                logger.error(f"Scheduled backup failed: {e}")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,33 @@
+# bot/services/event_service.py
+import logging
+from typing import Optional
+
+from bot.models.database import DatabaseManager
+from bot.models.models import Event
+
+logger = logging.getLogger(__name__)
+
+
+class EventService:
+    """Мероприятия: у каждого свои задания, попытки и прогресс игроков"""
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    @property
+    def active_event_id(self) -> Optional[int]:
+        return self.db.active_event_id
+
+    async def get_events(self) -> list:
+        return await self.db.get_events()
+
+    async def create_event(self, name: str) -> Optional[Event]:
+        return await self.db.create_event(name.strip())
+
+    async def switch_event(self, event_id: int) -> Optional[dict]:
+        """Переключить активное мероприятие. Лучше делать между раундами:
+        ответ, отправленный во время переключения, засчитается уже новому мероприятию"""
+        result = await self.db.switch_event(event_id)
+        if result is not None:
+            logger.info(f"Switched to event {event_id}: {result}")
+        return result
@@ -0,0 +1,50 @@
+# bot/services/export_service.py
+import asyncio
+import csv
+import gzip
+import logging
+import os
+import tempfile
+from typing import AsyncIterator, Sequence
+
+from bot.models.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+ATTEMPTS_HEADER = [
+    "attempt_id", "event_id", "attempted_at", "telegram_id", "username", "full_name",
+    "task_id", "task_title", "user_answer", "is_correct"
+]
+SCORES_HEADER = ["telegram_id", "username", "full_name", "score", "solved_count", "registered_at"]
+
+
+class ExportService:
+    """Выгрузка данных в сжатый CSV без загрузки таблиц в память целиком"""
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    async def export_attempts(self) -> str:
+        return await self._export(ATTEMPTS_HEADER, self.db.stream_attempts_export(), "attempts")
+
+    async def export_scores(self) -> str:
+        return await self._export(SCORES_HEADER, self.db.stream_scores_export(), "scores")
+
+    async def _export(self, header: list, partitions: AsyncIterator[Sequence], name: str) -> str:
+        """Записать порции строк во временный .csv.gz, возвращает путь к файлу"""
+        fd, path = tempfile.mkstemp(prefix=f"{name}_", suffix=".csv.gz")
+        os.close(fd)
+        rows = 0
+        try:
+            with gzip.open(path, "wt", encoding="utf-8", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(header)
+                async for partition in partitions:
+                    # Сжатие и запись - в отдельном потоке, чтобы не держать цикл событий
+                    await asyncio.to_thread(writer.writerows, partition)
+                    rows += len(partition)
+        except BaseException:
+            os.unlink(path)
+            raise
+        logger.info(f"Exported {rows} rows of {name} to {path}")
+        return path
@@ -0,0 +1,77 @@
+# bot/services/health.py
+import asyncio
+import logging
+from typing import Callable, Dict, Optional
+
+from aiohttp import web
+
+from bot.models.database import DatabaseManager
+from bot.utils.loop_monitor import LoopLagMonitor
+
+logger = logging.getLogger(__name__)
+
+
+class HealthServer:
+    """HTTP /healthz и /readyz на локальном порту для оркестратора.
+
+    /healthz - процесс жив и цикл событий не завис дольше max_lag.
+    /readyz - дополнительно бот принимает апдейты и БД отвечает за db_timeout.
+    Обе ручки возвращают глубину очередей и перцентили задержки цикла.
+    """
+
+    def __init__(self, db: DatabaseManager, monitor: LoopLagMonitor, host: str = "127.0.0.1",
+                 port: int = 8080, max_lag: float = 2.0, db_timeout: float = 2.0,
+                 queues: Optional[Dict[str, Callable[[], int]]] = None,
+                 is_ready: Optional[Callable[[], bool]] = None):
+        self.db = db
+        self.monitor = monitor
+        self.host = host
+        self.port = port
+        self.max_lag = max_lag
+        self.db_timeout = db_timeout
+        self.queues = queues or {}
+        self.is_ready = is_ready or (lambda: True)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/readyz", self.readyz)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Health endpoints listening on {self.host}:{self.port}")
+
+    def _report(self) -> dict:
+        return {
+            'loop_lag': self.monitor.percentiles(),
+            'loop_stalls': self.monitor.stalls,
+            'queues': {name: depth() for name, depth in self.queues.items()},
+        }
+
+    def _loop_ok(self) -> bool:
+        return self.monitor.current_lag <= self.max_lag
+
+    async def healthz(self, request: web.Request) -> web.Response:
+        report = self._report()
+        report['status'] = "ok" if self._loop_ok() else "loop_lagging"
+        return web.json_response(report, status=200 if self._loop_ok() else 503)
+
+    async def readyz(self, request: web.Request) -> web.Response:
+        report = self._report()
+        try:
+            await asyncio.wait_for(self.db.ping(), self.db_timeout)
+            report['database'] = "ok"
+        except Exception as e:
+            report['database'] = f"error: {type(e).__name__}"
+
+        ready = self.is_ready()
+        report['accepting_updates'] = ready
+        healthy = ready and report['database'] == "ok" and self._loop_ok()
+        report['status'] = "ready" if healthy else "not_ready"
+        return web.json_response(report, status=200 if healthy else 503)
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
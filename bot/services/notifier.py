@@ -0,0 +1,90 @@
+# bot/services/notifier.py
+import asyncio
+import logging
+import time
+from typing import Any, Iterable, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest, TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+
+class BulkSender:
+    """Фоновая массовая рассылка с ограничением скорости.
+
+    Telegram допускает около 30 сообщений в секунду в разные чаты,
+    поэтому рассылка идет через общую очередь с несколькими воркерами.
+    """
+
+    def __init__(self, bot: Bot, messages_per_second: float = 25, workers: int = 4):
+        self.bot = bot
+        self.interval = 1 / messages_per_second
+        self.workers_count = workers
+        self.queue: "asyncio.Queue[tuple]" = asyncio.Queue()
+        self.sent = 0
+        self.failed = 0
+        self._next_slot = 0.0
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def pending(self) -> int:
+        return self.queue.qsize()
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers_count)]
+
+    def send_many(self, chat_ids: Iterable[int], text: str, **kwargs: Any) -> int:
+        """Поставить сообщение в очередь для каждого чата, возвращает их количество"""
+        count = 0
+        for chat_id in chat_ids:
+            self.queue.put_nowait((chat_id, text, kwargs))
+            count += 1
+        return count
+
+    async def _wait_slot(self) -> None:
+        now = time.monotonic()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id, text, kwargs = await self.queue.get()
+            try:
+                await self._send(chat_id, text, kwargs)
+            finally:
+                self.queue.task_done()
+
+    async def _send(self, chat_id: int, text: str, kwargs: dict) -> None:
+        for _ in range(3):
+            await self._wait_slot()
+            try:
+                await self.bot.send_message(chat_id, text, **kwargs)
+                self.sent += 1
+                return
+            except TelegramRetryAfter as e:
+                # Сдвигаем общее окно, чтобы остальные воркеры тоже подождали
+                logger.warning(f"Flood control, retry after {e.retry_after}s")
+                self._next_slot = max(self._next_slot, time.monotonic() + e.retry_after)
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                logger.info(f"Can't notify {chat_id}: {e}")
+                break
+            except Exception as e:
+                logger.error(f"Error sending notification to {chat_id}: {e}")
+                break
+        self.failed += 1
+
+    async def close(self, timeout: Optional[float] = 10) -> None:
+        """Дождаться отправки очереди (не дольше timeout) и остановить воркеры"""
+        if self._workers and not self.queue.empty():
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Bulk sender stopped with {self.pending} unsent messages")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
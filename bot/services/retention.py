@@ -0,0 +1,96 @@
+# bot/services/retention.py
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from bot.models.database import DatabaseManager
+from bot.services.scheduler import utcnow
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionService:
+    """Перенос старых попыток в архив и постепенное сжатие файла БД.
+
+    Раз в interval секунд неправильные попытки старше retention_days
+    переносятся в user_attempts_archive порциями по batch_size, каждая
+    порция - отдельная короткая транзакция. Освободившиеся страницы
+    возвращаются ОС через PRAGMA incremental_vacuum, но только пока
+    в боте нет новых ответов дольше idle_seconds.
+    """
+
+    def __init__(self, db: DatabaseManager, retention_days: int = 30, interval: float = 3600,
+                 batch_size: int = 500, idle_seconds: float = 120, vacuum_pages: int = 1000,
+                 batch_pause: float = 0.05):
+        self.db = db
+        self.retention = timedelta(days=retention_days) if retention_days > 0 else None
+        self.interval = interval
+        self.batch_size = batch_size
+        self.idle_seconds = idle_seconds
+        self.vacuum_pages = vacuum_pages
+        self.batch_pause = batch_pause
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def run_once(self) -> dict:
+        archived = await self.archive()
+        freed = await self.vacuum()
+        if archived or freed:
+            logger.info(f"Retention: archived {archived} attempts, freed {freed} pages")
+        return {'archived': archived, 'freed_pages': freed}
+
+    async def archive(self) -> int:
+        if self.retention is None:
+            return 0
+        boundary = await self.db.get_archive_boundary(utcnow() - self.retention)
+        if boundary is None:
+            return 0
+
+        archived = 0
+        last_id = 0
+        while True:
+            moved, last_id = await self.db.archive_attempts_chunk(last_id, boundary, self.batch_size)
+            if not last_id:
+                break
+            archived += moved
+            # Между порциями блокировка записи свободна для обработчиков
+            await asyncio.sleep(self.batch_pause)
+        return archived
+
+    async def is_idle(self) -> bool:
+        last_attempt = await self.db.get_last_attempt_time()
+        if last_attempt is None:
+            return True
+        return (utcnow() - last_attempt).total_seconds() >= self.idle_seconds
+
+    async def vacuum(self) -> int:
+        freed = 0
+        # Сжимаем небольшими шагами и прекращаем, как только игроки снова активны
+        while await self.is_idle():
+            step = await self.db.incremental_vacuum(self.vacuum_pages)
+            if not step:
+                break
+            freed += step
+            await asyncio.sleep(self.batch_pause)
+        return freed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Retention run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,119 @@
+# bot/services/scheduler.py
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from bot.models.database import DatabaseManager
+from bot.models.models import RoundSchedule
+from bot.services.notifier import BulkSender
+
+logger = logging.getLogger(__name__)
+
+
+def utcnow() -> datetime:
+    # В БД время хранится как naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class RoundScheduler:
+    """Запуск раундов по расписанию.
+
+    Расписание хранится в БД, поэтому после перезапуска незавершенные раунды
+    подхватываются автоматически. За prepare_ahead секунд до старта задания
+    для всех участников выбираются заранее, а в момент старта применяются
+    одной транзакцией.
+    """
+
+    def __init__(self, db: DatabaseManager, notifier: BulkSender, prepare_ahead: float = 60,
+                 idle_check_interval: float = 60):
+        self.db = db
+        self.notifier = notifier
+        self.prepare_ahead = timedelta(seconds=prepare_ahead)
+        self.idle_check_interval = idle_check_interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def schedule_round(self, starts_at: datetime, min_score: Optional[int] = None,
+                             only_solved: bool = False) -> RoundSchedule:
+        schedule = await self.db.create_round_schedule(starts_at, min_score, only_solved)
+        self._wakeup.set()
+        return schedule
+
+    async def cancel_round(self, schedule_id: int) -> bool:
+        cancelled = await self.db.cancel_round_schedule(schedule_id)
+        self._wakeup.set()
+        return cancelled
+
+    async def _run(self) -> None:
+        while True:
+            # Сбрасываем до чтения расписания, чтобы не пропустить новый раунд
+            self._wakeup.clear()
+            try:
+                delay = await self._process_next()
+            except Exception as e:
+                logger.error(f"Round scheduler error: {e}")
+                delay = self.idle_check_interval
+            if delay > 0:
+                await self._sleep(delay)
+
+    async def _sleep(self, delay: float) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _process_next(self) -> float:
+        """Обработать ближайший раунд, возвращает время сна до следующего шага"""
+        schedules = await self.db.get_pending_schedules()
+        if not schedules:
+            return self.idle_check_interval
+        
+        schedule = schedules[0]
+        now = utcnow()
+        
+        if schedule.status == "pending":
+            prepare_at = schedule.starts_at - self.prepare_ahead
+            if now < prepare_at:
+                return min((prepare_at - now).total_seconds(), self.idle_check_interval)
+            count = await self.db.prepare_round_assignments(schedule)
+            logger.info(f"Round {schedule.id}: prepared assignments for {count} users")
+            return 0
+        
+        if now < schedule.starts_at:
+            return min((schedule.starts_at - now).total_seconds(), self.idle_check_interval)
+        
+        await self._start_round(schedule)
+        return 0
+
+    async def _start_round(self, schedule: RoundSchedule) -> None:
+        assigned = await self.db.apply_round_assignments(schedule.id)
+        logger.info(f"Round {schedule.id} started for {len(assigned)} users")
+        
+        with_task = [telegram_id for telegram_id, task_id in assigned if task_id]
+        without_task = [telegram_id for telegram_id, task_id in assigned if not task_id]
+        self.notifier.send_many(
+            with_task,
+            "🎯 <b>Начался новый раунд!</b>\n\n"
+            "Вам уже назначено задание - используйте /task чтобы посмотреть его.",
+            parse_mode="HTML"
+        )
+        self.notifier.send_many(
+            without_task,
+            "🎯 <b>Начался новый раунд!</b>\n\n"
+            "Вы решили все доступные задания - ожидайте новых.",
+            parse_mode="HTML"
+        )
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
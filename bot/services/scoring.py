@@ -0,0 +1,31 @@
+# bot/services/scoring.py
+import math
+
+
+class ScoringPolicy:
+    """Правило начисления баллов за задание.
+
+    static  - всегда Task.points;
+    dynamic - стоимость падает с числом решивших (как в CTF) от Task.points
+              до minimum: первый решивший получает points, падение считается
+              от второго, и минимум достигается на (decay + 1)-м решении.
+    """
+
+    def __init__(self, mode: str = "static", minimum: int = 1, decay: int = 20):
+        if mode not in ("static", "dynamic"):
+            raise ValueError(f"Unknown scoring mode: {mode}")
+        self.mode = mode
+        self.minimum = minimum
+        self.decay = max(decay, 1)
+
+    @property
+    def dynamic(self) -> bool:
+        return self.mode == "dynamic"
+
+    def value(self, points: int, solves: int) -> int:
+        """Стоимость задания при solves решивших (первый решивший получает points)"""
+        if not self.dynamic or solves <= 1:
+            return points
+        minimum = min(self.minimum, points)
+        value = (minimum - points) / (self.decay ** 2) * (solves - 1) ** 2 + points
+        return max(minimum, math.ceil(value))
@@ -0,0 +1,94 @@
+# bot/services/task_purge.py
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from bot.models.database import DatabaseManager
+from bot.models.models import Task
+from bot.services.scheduler import utcnow
+from bot.services.task_stats import TaskStatsTracker
+from bot.utils.render import invalidate_task
+
+logger = logging.getLogger(__name__)
+
+
+class TaskPurger:
+    """Фоновое удаление мягко удаленных заданий.
+
+    /delete_task только скрывает задание. Через delay секунд после этого
+    попытки по заданию удаляются из user_attempts и архива порциями
+    по batch_size, каждая порция - отдельная короткая транзакция,
+    затем удаляется сама строка задания. Пока delay не истек,
+    удаление можно отменить через restore().
+    """
+
+    def __init__(self, db: DatabaseManager, stats: Optional[TaskStatsTracker] = None,
+                 delay: float = 3600, interval: float = 300, batch_size: int = 500,
+                 batch_pause: float = 0.05):
+        self.db = db
+        self.stats = stats
+        self.delay = timedelta(seconds=delay)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def restore(self, task_id: int) -> Optional[Task]:
+        """Отменить удаление, пока задание не передано на очистку"""
+        task = await self.db.restore_task(task_id, utcnow() - self.delay)
+        if task:
+            invalidate_task(task_id)
+            logger.info(f"Task {task_id} restored")
+        return task
+
+    async def run_once(self) -> dict:
+        purged = 0
+        attempts = 0
+        for task_id in await self.db.get_purgeable_tasks(utcnow() - self.delay):
+            deleted, done = await self.purge(task_id)
+            attempts += deleted
+            purged += done
+        if purged or attempts:
+            logger.info(f"Task purge: removed {purged} tasks, {attempts} attempts")
+        return {'tasks': purged, 'attempts': attempts}
+
+    async def purge(self, task_id: int) -> Tuple[int, bool]:
+        """Удалить попытки и строку задания. Возвращает (удалено попыток, удалено ли задание)"""
+        deleted = 0
+        for archived in (False, True):
+            while True:
+                rows = await self.db.delete_task_attempts_chunk(task_id, self.batch_size, archived)
+                if not rows:
+                    break
+                deleted += len(rows)
+                # Между порциями блокировка записи свободна для обработчиков
+                await asyncio.sleep(self.batch_pause)
+
+        done = await self.db.finish_task_purge(task_id)
+        if done:
+            if self.stats is not None:
+                self.stats.discard(task_id)
+            invalidate_task(task_id)
+        return deleted, done
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Task purge failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
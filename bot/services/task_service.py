@@ -1,14 +1,28 @@
 # bot/services/task_service.py
-from typing import Optional, List
+import asyncio
+from datetime import timezone
+from typing import Optional, List, Tuple
 from bot.models.database import DatabaseManager
 from bot.models.models import Task
+from bot.services.attempt_writer import AttemptWriter
+from bot.services.scoring import ScoringPolicy
+from bot.services.task_stats import TaskStats, TaskStatsTracker
+from bot.utils.render import invalidate_task
 import logging
 
 logger = logging.getLogger(__name__)
 
+def answers_match(correct_answer: str, user_answer: str) -> bool:
+    """Сравнение ответа пользователя с правильным"""
+    return correct_answer.lower().strip() == user_answer.lower().strip()
+
 class TaskService:
-    def __init__(self, db: DatabaseManager):
+    def __init__(self, db: DatabaseManager, attempt_writer: Optional[AttemptWriter] = None,
+                 scoring: Optional[ScoringPolicy] = None, stats: Optional[TaskStatsTracker] = None):
         self.db = db
+        self.attempt_writer = attempt_writer
+        self.scoring = scoring or ScoringPolicy()
+        self.stats = stats
 
     async def create_task(self, title: str, description: str, image_url: Optional[str], 
                          correct_answer: str, points: int) -> Task:
@@ -17,31 +31,115 @@ class TaskService:
         )
 
     async def get_random_task_for_user(self, telegram_id: int) -> Optional[Task]:
-        user = await self.db.get_user_by_telegram_id(telegram_id)
+        user = self.db.user_cache.get(telegram_id) or await self.db.get_user_by_telegram_id(telegram_id)
         if not user or not user.can_get_task:
             return None
         
-        return await self.db.get_random_task_for_user(user.id)
+        return await self.db.get_random_task_for_user(user.id, user.team_id)
 
     async def check_answer(self, task_id: int, user_answer: str) -> bool:
         task = await self.db.get_task_by_id(task_id)
         if not task:
             return False
         
-        # Улучшенная проверка ответа
-        correct = task.correct_answer.lower().strip()
-        user_ans = user_answer.lower().strip()
-        
-        logger.info(f"Checking answer - Correct: '{correct}', User: '{user_ans}'")
+        logger.info(f"Checking answer - Correct: '{task.correct_answer}', User: '{user_answer}'")
         
         # Сравниваем ответы
-        return correct == user_ans
+        return answers_match(task.correct_answer, user_answer)
+
+    async def regrade_task(self, task_id: int, chunk_size: int = 1000) -> Optional[dict]:
+        """Перепроверить все попытки по заданию с текущим правильным ответом.
+
+        Попытки читаются порциями, изменения статусов применяются одной
+        транзакцией в конце; решившие и баллы пересчитываются внутри нее.
+        Возвращает сводку или None, если задания нет в активном мероприятии:
+        баллы в users относятся только к нему.
+        """
+        task = await self.db.get_task_by_id(task_id)
+        if not task or task.event_id != self.db.active_event_id:
+            return None
+        
+        # Неправильные ответы из буфера тоже должны попасть в перепроверку
+        if self.attempt_writer is not None:
+            await self.attempt_writer.flush()
+        
+        correct_ids = []
+        incorrect_ids = []
+        # Статистика по заданию собирается заново вместе с перепроверкой
+        task_stats = TaskStats()
+        checked = 0
+        last_id = 0
+        
+        while True:
+            chunk = await self.db.get_task_attempts_chunk(task_id, last_id, chunk_size)
+            if not chunk:
+                break
+            for attempt_id, user_id, user_answer, was_correct, attempted_at in chunk:
+                is_correct = answers_match(task.correct_answer, user_answer)
+                task_stats.record(user_id, user_answer, is_correct,
+                                  attempted_at.replace(tzinfo=timezone.utc).timestamp())
+                if is_correct and not was_correct:
+                    correct_ids.append(attempt_id)
+                elif was_correct and not is_correct:
+                    incorrect_ids.append(attempt_id)
+            checked += len(chunk)
+            last_id = chunk[-1][0]
+            # Отдаем управление циклу событий между порциями
+            await asyncio.sleep(0)
+        
+        result = await self.db.apply_regrade(task_id, correct_ids, incorrect_ids, self.scoring)
+        if self.stats is not None:
+            self.stats.replace(task_id, task_stats)
+        
+        summary = {
+            'checked': checked,
+            'now_correct': len(correct_ids),
+            'now_incorrect': len(incorrect_ids),
+            'gained': len(result['gained']),
+            'revoked': len(result['revoked']),
+            'solve_count': result['solve_count']
+        }
+        logger.info(f"Regraded task {task_id}: {summary}")
+        return summary
+
+    async def record_attempt(self, user_id: int, task_id: int, user_answer: str, is_correct: bool) -> None:
+        """Записать попытку: правильные - сразу, неправильные - пакетами"""
+        if is_correct or self.attempt_writer is None:
+            await self.db.create_attempt(user_id, task_id, user_answer, is_correct)
+        else:
+            await self.attempt_writer.add(user_id, task_id, user_answer)
+        if self.stats is not None:
+            self.stats.record(task_id, user_id, user_answer, is_correct)
+
+    async def record_solve(self, user_id: int, task_id: int, user_answer: str) -> Tuple[int, int]:
+        """Засчитать решение, возвращает (начислено баллов, новый счет)"""
+        result = await self.db.record_solve(user_id, task_id, user_answer, self.scoring)
+        if self.stats is not None:
+            self.stats.record(task_id, user_id, user_answer, True)
+        return result
+
+    def task_value(self, task: Task) -> int:
+        """Сколько баллов получит следующий решивший"""
+        return self.scoring.value(task.points, (task.solve_count or 0) + 1)
 
     async def get_all_tasks(self) -> List[Task]:
         return await self.db.get_all_tasks()
 
+    async def delete_task(self, task_id: int) -> Optional[List[int]]:
+        """Мягко удалить задание. Возвращает telegram_id игроков, у которых оно было текущим"""
+        affected = await self.db.soft_delete_task(task_id)
+        if affected is not None:
+            invalidate_task(task_id)
+            logger.info(f"Task {task_id} deleted, cleared for {len(affected)} users")
+        return affected
+
+    async def search_tasks(self, query: str, limit: int = 5, offset: int = 0) -> Tuple[list, int]:
+        return await self.db.search_tasks(query, limit, offset)
+
     async def get_task_by_id(self, task_id: int) -> Optional[Task]:
         return await self.db.get_task_by_id(task_id)
 
     async def update_task(self, task_id: int, **kwargs) -> Optional[Task]:
-        return await self.db.update_task(task_id, **kwargs)
\ No newline at end of file
+        task = await self.db.update_task(task_id, self.scoring, **kwargs)
+        invalidate_task(task_id)
+        return task
\ No newline at end of file
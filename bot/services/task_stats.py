@@ -0,0 +1,205 @@
+# bot/services/task_stats.py
+import asyncio
+import json
+import logging
+import random
+import statistics
+import time
+from datetime import timezone
+from typing import Dict, List, Optional, Set
+
+from bot.models.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class TopKSketch:
+    """Приближенный топ частых значений (алгоритм Space-Saving) в фиксированной памяти"""
+
+    def __init__(self, capacity: int = 50):
+        self.capacity = capacity
+        # значение -> [счетчик, максимальная переоценка]
+        self.counters: Dict[str, List[int]] = {}
+
+    def add(self, value: str) -> None:
+        counter = self.counters.get(value)
+        if counter is not None:
+            counter[0] += 1
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[value] = [1, 0]
+            return
+        # Вытесняем самое редкое значение, новое наследует его счетчик
+        rarest = min(self.counters, key=lambda key: self.counters[key][0])
+        count = self.counters.pop(rarest)[0]
+        self.counters[value] = [count + 1, count]
+
+    def top(self, n: int) -> List[tuple]:
+        items = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)
+        return [(value, counter[0]) for value, counter in items[:n]]
+
+
+class TaskStats:
+    """Счетчики по одному заданию"""
+
+    __slots__ = ("attempts", "correct", "users", "solvers", "first_attempt",
+                 "solve_times", "solve_samples", "wrong_answers")
+
+    # Сколько значений времени решения хранить для оценки медианы
+    MAX_SOLVE_SAMPLES = 1000
+
+    def __init__(self):
+        self.attempts = 0
+        self.correct = 0
+        self.users: Set[int] = set()
+        self.solvers: Set[int] = set()
+        # user_id -> время первой попытки для тех, кто еще не решил
+        self.first_attempt: Dict[int, float] = {}
+        self.solve_times: List[float] = []
+        self.solve_samples = 0
+        self.wrong_answers = TopKSketch()
+
+    def record(self, user_id: int, answer: str, is_correct: bool, at: float) -> None:
+        self.attempts += 1
+        self.users.add(user_id)
+        if not is_correct:
+            self.wrong_answers.add(answer)
+            self.first_attempt.setdefault(user_id, at)
+            return
+
+        self.correct += 1
+        if user_id in self.solvers:
+            return
+        self.solvers.add(user_id)
+        started_at = self.first_attempt.pop(user_id, at)
+        self._add_solve_time(max(0.0, at - started_at))
+
+    def _add_solve_time(self, seconds: float) -> None:
+        # Reservoir sampling: медиана по равномерной выборке ограниченного размера
+        self.solve_samples += 1
+        if len(self.solve_times) < self.MAX_SOLVE_SAMPLES:
+            self.solve_times.append(seconds)
+            return
+        index = random.randrange(self.solve_samples)
+        if index < self.MAX_SOLVE_SAMPLES:
+            self.solve_times[index] = seconds
+
+    def summary(self, top: int = 5) -> dict:
+        return {
+            'attempts': self.attempts,
+            'participants': len(self.users),
+            'solvers': len(self.solvers),
+            'solve_rate': len(self.solvers) / len(self.users) if self.users else 0.0,
+            'median_solve_seconds': statistics.median(self.solve_times) if self.solve_times else None,
+            'top_wrong_answers': self.wrong_answers.top(top)
+        }
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'attempts': self.attempts,
+            'correct': self.correct,
+            'users': list(self.users),
+            'solvers': list(self.solvers),
+            'first_attempt': self.first_attempt,
+            'solve_times': self.solve_times,
+            'solve_samples': self.solve_samples,
+            'wrong_answers': self.wrong_answers.counters
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: str) -> "TaskStats":
+        raw = json.loads(data)
+        stats = cls()
+        stats.attempts = raw['attempts']
+        stats.correct = raw['correct']
+        stats.users = set(raw['users'])
+        stats.solvers = set(raw['solvers'])
+        stats.first_attempt = {int(user_id): at for user_id, at in raw['first_attempt'].items()}
+        stats.solve_times = raw['solve_times']
+        stats.solve_samples = raw['solve_samples']
+        stats.wrong_answers.counters = raw['wrong_answers']
+        return stats
+
+
+class TaskStatsTracker:
+    """Статистика по заданиям, обновляемая по мере поступления попыток.
+
+    Счетчики живут в памяти и периодически сохраняются в таблицу task_stats,
+    поэтому /task_stats не делает GROUP BY по user_attempts.
+    """
+
+    def __init__(self, db: DatabaseManager, persist_interval: float = 60):
+        self.db = db
+        self.persist_interval = persist_interval
+        self._stats: Dict[int, TaskStats] = {}
+        self._dirty: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def load(self) -> int:
+        """Загрузить сохраненную статистику, при первом запуске - собрать по попыткам"""
+        for task_id, data in await self.db.load_task_stats():
+            self._stats[task_id] = TaskStats.from_json(data)
+        if self._stats:
+            return len(self._stats)
+
+        # Сохраненной статистики нет - однократно проходим по всем попыткам
+        async for partition in self.db.stream_attempts_for_stats():
+            for task_id, user_id, answer, is_correct, attempted_at in partition:
+                self.record(task_id, user_id, answer, is_correct,
+                            attempted_at.replace(tzinfo=timezone.utc).timestamp())
+            await asyncio.sleep(0)
+        return len(self._stats)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def record(self, task_id: int, user_id: int, answer: str, is_correct: bool,
+               at: Optional[float] = None) -> None:
+        stats = self._stats.get(task_id)
+        if stats is None:
+            stats = self._stats[task_id] = TaskStats()
+        stats.record(user_id, answer, is_correct, time.time() if at is None else at)
+        self._dirty.add(task_id)
+
+    def replace(self, task_id: int, stats: TaskStats) -> None:
+        """Подменить статистику задания (после перепроверки ответов)"""
+        self._stats[task_id] = stats
+        self._dirty.add(task_id)
+
+    def discard(self, task_id: int) -> None:
+        """Забыть статистику удаленного задания"""
+        self._stats.pop(task_id, None)
+        self._dirty.discard(task_id)
+
+    def get(self, task_id: int) -> Optional[dict]:
+        stats = self._stats.get(task_id)
+        return stats.summary() if stats else None
+
+    async def persist(self) -> int:
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, set()
+        records = {task_id: self._stats[task_id].to_json() for task_id in dirty if task_id in self._stats}
+        try:
+            await self.db.save_task_stats(records)
+        except Exception as e:
+            self._dirty |= dirty
+            logger.error(f"Failed to persist task stats: {e}")
+            return 0
+        return len(records)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            await self.persist()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.persist()
@@ -1,14 +1,65 @@
 # bot/services/user_service.py
+import asyncio
 from bot.models.database import DatabaseManager
 from bot.models.models import User, Task
-from typing import Optional, List
+from bot.models.user_cache import UserState
+from bot.models.team_cache import TeamState
+from typing import Optional, List, Tuple
 
 class UserService:
     def __init__(self, db: DatabaseManager):
         self.db = db
+        self.cache = db.user_cache
+        # Регистрации, ждущие следующего пакетного upsert
+        self._pending_profiles: List[Tuple[Tuple[int, Optional[str], str], asyncio.Future]] = []
+        self._register_task: Optional[asyncio.Task] = None
 
-    async def get_or_create_user(self, telegram_id: int, username: str, full_name: str) -> User:
-        return await self.db.get_or_create_user(telegram_id, username, full_name)
+    async def get_or_create_user(self, telegram_id: int, username: Optional[str], full_name: str) -> UserState:
+        state = self.cache.get(telegram_id)
+        if state is not None and state.username == username and state.full_name == full_name:
+            return state
+        return await self.register_user(telegram_id, username, full_name)
+
+    async def register_user(self, telegram_id: int, username: Optional[str], full_name: str) -> UserState:
+        """Upsert пользователя с групповой записью.
+
+        Пока выполняется один upsert, новые регистрации копятся и уходят
+        следующим одним INSERT: при наплыве игроков на входе вместо сотни
+        коммитов получается несколько, а в тишине задержки нет.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending_profiles.append(((telegram_id, username, full_name), future))
+        if self._register_task is None:
+            self._register_task = asyncio.create_task(self._register_pending())
+        return await future
+
+    async def _register_pending(self) -> None:
+        try:
+            while self._pending_profiles:
+                batch, self._pending_profiles = self._pending_profiles, []
+                try:
+                    states = await self.db.upsert_users([profile for profile, _ in batch])
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (telegram_id, _, _), future in batch:
+                    # Обработчик мог быть отменен, пока шла запись
+                    if not future.done():
+                        future.set_result(states[telegram_id])
+        finally:
+            self._register_task = None
+
+    async def get_user_state(self, telegram_id: int) -> Optional[UserState]:
+        """Состояние пользователя из кэша, при промахе - из БД"""
+        state = self.cache.get(telegram_id)
+        if state is not None:
+            return state
+        user = await self.db.get_user_by_telegram_id(telegram_id)
+        if not user:
+            return None
+        return self.cache.put_user(user)
 
     async def update_user_score(self, telegram_id: int, points: int) -> None:
         await self.db.update_user_score(telegram_id, points)
@@ -19,24 +70,50 @@ class UserService:
     async def set_user_current_task(self, telegram_id: int, task_id: Optional[int]) -> None:
         await self.db.set_user_current_task(telegram_id, task_id)
 
+    async def open_round(self, min_score: Optional[int] = None, only_solved: bool = False) -> List[int]:
+        return await self.db.open_round(min_score, only_solved)
+
+    async def create_team(self, name: str) -> Optional[TeamState]:
+        team = await self.db.create_team(name)
+        return self.db.team_cache.get(team.id) if team else None
+
+    def find_team(self, name: str) -> Optional[TeamState]:
+        return self.db.team_cache.find(name)
+
+    def get_team(self, team_id: Optional[int]) -> Optional[TeamState]:
+        return self.db.team_cache.get(team_id)
+
+    async def join_team(self, telegram_id: int, team_id: int) -> None:
+        await self.db.set_user_team(telegram_id, team_id)
+
+    def get_leaderboard(self, limit: int = 10) -> List[TeamState]:
+        return self.db.team_cache.leaderboard(limit)
+
+    def get_team_place(self, team_id: int) -> Optional[int]:
+        return self.db.team_cache.place(team_id)
+
     async def get_user_current_task(self, telegram_id: int) -> Optional[Task]:
-        return await self.db.get_user_current_task(telegram_id)
+        state = await self.get_user_state(telegram_id)
+        if not state or not state.current_task_id:
+            return None
+        return await self.db.get_task_by_id(state.current_task_id)
 
     async def get_user_stats(self, telegram_id: int) -> dict:
-        user = await self.db.get_user_by_telegram_id(telegram_id)
+        user = await self.get_user_state(telegram_id)
         if not user:
             return None
         
-        attempts = await self.db.get_user_attempts(user.id)
-        solved_count = len([a for a in attempts if a.is_correct])
+        solved_count = await self.db.count_user_solved(user.id)
         current_task = await self.get_user_current_task(telegram_id)
+        team = self.get_team(user.team_id)
         
         return {
             'score': user.score,
             'solved_count': solved_count,
             'can_get_task': user.can_get_task,
             'username': user.username,
-            'current_task': current_task.title if current_task else None
+            'current_task': current_task.title if current_task else None,
+            'team': team.name if team else None
         }
 
     async def get_all_users(self) -> List[User]:
@@ -5,6 +5,7 @@ from pathlib import Path
 from dataclasses import dataclass
 from typing import List
 from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +14,47 @@ class Config:
     BOT_TOKEN: str
     ADMIN_IDS: List[int]
     DATABASE_URL: str
+    DATA_DIR: str = "data"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    DEDUP_UPDATE_TTL: float = 600.0
+    DEDUP_MAX_UPDATES: int = 50000
+    DEDUP_CONTENT_WINDOW: float = 3.0
+    USER_CACHE_MAX_MB: float = 64.0
+    USER_CACHE_TTL: float = 3600.0
+    ATTEMPT_BATCH_SIZE: int = 200
+    ATTEMPT_FLUSH_INTERVAL: float = 1.0
+    ATTEMPT_MAX_PENDING: int = 10000
+    SCHEDULE_UTC_OFFSET: int = 0
+    ROUND_PREPARE_AHEAD: float = 60.0
+    SCORING_MODE: str = "static"
+    DYNAMIC_MIN_POINTS: int = 1
+    DYNAMIC_DECAY: int = 20
+    STATS_PERSIST_INTERVAL: float = 60.0
+    RETENTION_DAYS: int = 30
+    RETENTION_INTERVAL: float = 3600.0
+    RETENTION_BATCH_SIZE: int = 500
+    RETENTION_IDLE_SECONDS: float = 120.0
+    VACUUM_PAGES: int = 1000
+    TASK_PURGE_DELAY: float = 3600.0
+    TASK_PURGE_INTERVAL: float = 300.0
+    TASK_PURGE_BATCH_SIZE: int = 500
+    BACKUP_DIR: str = "data/backups"
+    BACKUP_INTERVAL: float = 3600.0
+    BACKUP_KEEP: int = 24
+    BACKUP_PAGES_PER_STEP: int = 256
+    BACKUP_STEP_SLEEP: float = 0.01
+    SHUTDOWN_TIMEOUT: float = 20.0
+    TELEGRAM_POOL_SIZE: int = 100
+    TELEGRAM_MAX_CONCURRENCY: int = 50
+    TELEGRAM_MAX_RETRIES: int = 3
+    TELEGRAM_MAX_RETRY_AFTER: float = 60.0
+    HEALTH_HOST: str = "127.0.0.1"
+    HEALTH_PORT: int = 8080
+    LOOP_LAG_THRESHOLD: float = 0.25
+    HEALTH_MAX_LAG: float = 2.0
 
 def load_config() -> Config:
     # Получаем абсолютный путь к .env файлу
@@ -36,9 +78,6 @@ def load_config() -> Config:
     logger.info(f"BOT_TOKEN from env: {'*' * 10 if bot_token else 'NOT FOUND'}")
     
     if not bot_token:
-        # Выводим все переменные окружения для отладки
-        all_env_vars = {k: v for k, v in os.environ.items() if 'TOKEN' in k or 'BOT' in k}
-        logger.info(f"Relevant env vars: {all_env_vars}")
         raise ValueError("BOT_TOKEN not found in environment variables")
     
     admin_ids_str = os.getenv('ADMIN_IDS', '')
@@ -56,10 +95,51 @@ def load_config() -> Config:
     
     logger.info(f"Config loaded successfully")
     logger.info(f"Admin IDs: {admin_ids}")
-    logger.info(f"Database URL: {database_url}")
+    logger.info(f"Database URL: {make_url(database_url).render_as_string(hide_password=True)}")
     
     return Config(
         BOT_TOKEN=bot_token,
         ADMIN_IDS=admin_ids,
-        DATABASE_URL=database_url
+        DATABASE_URL=database_url,
+        DATA_DIR=os.getenv('DATA_DIR', 'data'),
+        DB_POOL_SIZE=int(os.getenv('DB_POOL_SIZE', '10')),
+        DB_MAX_OVERFLOW=int(os.getenv('DB_MAX_OVERFLOW', '20')),
+        DB_POOL_TIMEOUT=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        DB_STATEMENT_CACHE_SIZE=int(os.getenv('DB_STATEMENT_CACHE_SIZE', '500')),
+        DEDUP_UPDATE_TTL=float(os.getenv('DEDUP_UPDATE_TTL', '600')),
+        DEDUP_MAX_UPDATES=int(os.getenv('DEDUP_MAX_UPDATES', '50000')),
+        DEDUP_CONTENT_WINDOW=float(os.getenv('DEDUP_CONTENT_WINDOW', '3')),
+        USER_CACHE_MAX_MB=float(os.getenv('USER_CACHE_MAX_MB', '64')),
+        USER_CACHE_TTL=float(os.getenv('USER_CACHE_TTL', '3600')),
+        ATTEMPT_BATCH_SIZE=int(os.getenv('ATTEMPT_BATCH_SIZE', '200')),
+        ATTEMPT_FLUSH_INTERVAL=float(os.getenv('ATTEMPT_FLUSH_INTERVAL', '1')),
+        ATTEMPT_MAX_PENDING=int(os.getenv('ATTEMPT_MAX_PENDING', '10000')),
+        SCHEDULE_UTC_OFFSET=int(os.getenv('SCHEDULE_UTC_OFFSET', '0')),
+        ROUND_PREPARE_AHEAD=float(os.getenv('ROUND_PREPARE_AHEAD', '60')),
+        SCORING_MODE=os.getenv('SCORING_MODE', 'static'),
+        DYNAMIC_MIN_POINTS=int(os.getenv('DYNAMIC_MIN_POINTS', '1')),
+        DYNAMIC_DECAY=int(os.getenv('DYNAMIC_DECAY', '20')),
+        STATS_PERSIST_INTERVAL=float(os.getenv('STATS_PERSIST_INTERVAL', '60')),
+        RETENTION_DAYS=int(os.getenv('RETENTION_DAYS', '30')),
+        RETENTION_INTERVAL=float(os.getenv('RETENTION_INTERVAL', '3600')),
+        RETENTION_BATCH_SIZE=int(os.getenv('RETENTION_BATCH_SIZE', '500')),
+        RETENTION_IDLE_SECONDS=float(os.getenv('RETENTION_IDLE_SECONDS', '120')),
+        VACUUM_PAGES=int(os.getenv('VACUUM_PAGES', '1000')),
+        TASK_PURGE_DELAY=float(os.getenv('TASK_PURGE_DELAY', '3600')),
+        TASK_PURGE_INTERVAL=float(os.getenv('TASK_PURGE_INTERVAL', '300')),
+        TASK_PURGE_BATCH_SIZE=int(os.getenv('TASK_PURGE_BATCH_SIZE', '500')),
+        BACKUP_DIR=os.getenv('BACKUP_DIR', os.path.join(os.getenv('DATA_DIR', 'data'), 'backups')),
+        BACKUP_INTERVAL=float(os.getenv('BACKUP_INTERVAL', '3600')),
+        BACKUP_KEEP=int(os.getenv('BACKUP_KEEP', '24')),
+        BACKUP_PAGES_PER_STEP=int(os.getenv('BACKUP_PAGES_PER_STEP', '256')),
+        BACKUP_STEP_SLEEP=float(os.getenv('BACKUP_STEP_SLEEP', '0.01')),
+        SHUTDOWN_TIMEOUT=float(os.getenv('SHUTDOWN_TIMEOUT', '20')),
+        TELEGRAM_POOL_SIZE=int(os.getenv('TELEGRAM_POOL_SIZE', '100')),
+        TELEGRAM_MAX_CONCURRENCY=int(os.getenv('TELEGRAM_MAX_CONCURRENCY', '50')),
+        TELEGRAM_MAX_RETRIES=int(os.getenv('TELEGRAM_MAX_RETRIES', '3')),
+        TELEGRAM_MAX_RETRY_AFTER=float(os.getenv('TELEGRAM_MAX_RETRY_AFTER', '60')),
+        HEALTH_HOST=os.getenv('HEALTH_HOST', '127.0.0.1'),
+        HEALTH_PORT=int(os.getenv('HEALTH_PORT', '8080')),
+        LOOP_LAG_THRESHOLD=float(os.getenv('LOOP_LAG_THRESHOLD', '0.25')),
+        HEALTH_MAX_LAG=float(os.getenv('HEALTH_MAX_LAG', '2'))
     )
\ No newline at end of file
@@ -0,0 +1,34 @@
+# bot/utils/healthcheck.py
+"""Проверка /healthz для HEALTHCHECK контейнера: python -m bot.utils.healthcheck
+
+Порт и адрес берутся из тех же HEALTH_PORT и HEALTH_HOST, что и у сервера.
+При HEALTH_PORT=0 сервер выключен, и проверка всегда успешна.
+"""
+import os
+import sys
+import urllib.request
+
+# Сервер, слушающий все адреса, доступен изнутри контейнера через loopback
+WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+
+
+def main() -> int:
+    port = int(os.getenv("HEALTH_PORT", "8080"))
+    if not port:
+        return 0
+    host = os.getenv("HEALTH_HOST", "127.0.0.1")
+    if host in WILDCARD_HOSTS:
+        host = "127.0.0.1"
+    if ":" in host:
+        host = f"[{host}]"
+    try:
+        # Ответ не 2xx тоже бросает исключение
+        urllib.request.urlopen(f"http://{host}:{port}/healthz", timeout=3)
+    except Exception as e:
+        print(f"Health check failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# bot/utils/loop_monitor.py
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Замер задержки планирования цикла событий.
+
+    Корутина засыпает на interval секунд и записывает, насколько позже
+    она проснулась. Отдельный поток-сторож следит за отметкой времени,
+    которую обновляет корутина: если цикл не отвечает дольше threshold,
+    сторож снимает стек потока цикла - это и есть код, который его блокирует.
+    """
+
+    def __init__(self, interval: float = 0.5, threshold: float = 0.25, window: int = 600,
+                 max_samples: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = deque(maxlen=window)
+        self.samples = deque(maxlen=max_samples)
+        self.stalls = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def percentiles(self) -> dict:
+        if not self.lags:
+            return {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        ordered = sorted(self.lags)
+        last = len(ordered) - 1
+        return {
+            'p50_ms': round(ordered[int(0.50 * last)] * 1000, 1),
+            'p95_ms': round(ordered[int(0.95 * last)] * 1000, 1),
+            'p99_ms': round(ordered[int(0.99 * last)] * 1000, 1),
+            'max_ms': round(ordered[last] * 1000, 1),
+        }
+
+    @property
+    def current_lag(self) -> float:
+        return self.lags[-1] if self.lags else 0.0
+
+    async def _run(self) -> None:
+        while True:
+            started_at = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - started_at - self.interval)
+            self.lags.append(lag)
+            if lag > self.threshold:
+                logger.warning(f"Event loop lag {lag * 1000:.0f}ms")
+
+    def _watch(self) -> None:
+        # Проверяем чаще, чем порог, чтобы застать блокирующий код на месте
+        check_every = min(self.interval, self.threshold) / 2
+        stalled = False
+        while not self._stop.wait(check_every):
+            blocked_for = time.monotonic() - self._heartbeat - self.interval
+            if blocked_for <= self.threshold:
+                stalled = False
+                continue
+            if stalled:
+                continue
+            # Один снимок стека на каждую остановку цикла
+            stalled = True
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            self.samples.append({'at': time.time(), 'blocked_ms': round(blocked_for * 1000), 'stack': stack})
+            logger.warning(f"Event loop blocked for {blocked_for * 1000:.0f}ms at:\n{stack}")
+
+    def recent_samples(self) -> List[dict]:
+        return list(self.samples)
+
+    async def close(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
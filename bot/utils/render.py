@@ -0,0 +1,68 @@
+# bot/utils/render.py
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from aiogram import types
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from bot.models.models import Task
+
+# task_id -> {(вид, версия, баллы): текст}
+_task_texts: Dict[int, Dict[Tuple, str]] = {}
+
+
+def _cached(task: Task, kind: str, points: int, render) -> str:
+    key = (kind, task.version, points)
+    texts = _task_texts.setdefault(task.id, {})
+    text = texts.get(key)
+    if text is None:
+        text = texts[key] = render()
+    return text
+
+
+def invalidate_task(task_id: int) -> None:
+    """Сбросить отрисованные тексты задания (после изменения)"""
+    _task_texts.pop(task_id, None)
+
+
+def render_task_message(task: Task, points: int) -> str:
+    """Текст задания для игрока"""
+    return _cached(task, "player", points, lambda: (
+        f"📚 <b>{task.title}</b>\n\n"
+        f"📖 {task.description}\n\n"
+        f"🏆 Баллов за решение: {points}"
+    ))
+
+
+def render_task_edit(task: Task) -> str:
+    """Карточка задания для редактирования админом"""
+    return _cached(task, "edit", task.points, lambda: (
+        f"📝 <b>Редактирование задания</b>\n\n"
+        f"🆔 ID: {task.id}\n"
+        f"📚 Название: {task.title}\n"
+        f"📖 Описание: {task.description}\n"
+        f"🖼️ Картинка: {task.image_url or 'нет'}\n"
+        f"✅ Ответ: <code>{task.correct_answer}</code>\n"
+        f"🏆 Баллы: {task.points}\n"
+        f"📊 Статус: {'✅ Активно' if task.is_active else '❌ Неактивно'}\n\n"
+        f"Выберите что редактировать:"
+    ))
+
+
+@lru_cache(maxsize=1024)
+def edit_task_keyboard(task_id: int) -> types.InlineKeyboardMarkup:
+    """Кнопки редактирования зависят только от id задания"""
+    builder = InlineKeyboardBuilder()
+    builder.add(
+        types.InlineKeyboardButton(text="📚 Название", callback_data=f"edit_title_{task_id}"),
+        types.InlineKeyboardButton(text="📖 Описание", callback_data=f"edit_desc_{task_id}"),
+    )
+    builder.add(
+        types.InlineKeyboardButton(text="🖼️ Картинка", callback_data=f"edit_image_{task_id}"),
+        types.InlineKeyboardButton(text="✅ Ответ", callback_data=f"edit_answer_{task_id}"),
+    )
+    builder.add(
+        types.InlineKeyboardButton(text="🏆 Баллы", callback_data=f"edit_points_{task_id}"),
+        types.InlineKeyboardButton(text="📊 Статус", callback_data=f"edit_status_{task_id}"),
+    )
+    return builder.as_markup()
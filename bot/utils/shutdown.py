@@ -0,0 +1,50 @@
+# bot/utils/shutdown.py
+import asyncio
+import logging
+import signal
+from contextlib import suppress
+from typing import Optional
+
+from aiogram import Dispatcher
+
+from bot.middlewares.in_flight import InFlightMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+class ShutdownCoordinator:
+    """Остановка по SIGTERM/SIGINT.
+
+    Сигнал останавливает polling, после чего drain() ждет обработчики,
+    которые уже взяли апдейты. Буферы, кэши и движок БД закрываются
+    вызывающим кодом после drain(), пока сессия бота еще открыта.
+    """
+
+    def __init__(self, dp: Dispatcher, in_flight: InFlightMiddleware, drain_timeout: float = 20):
+        self.dp = dp
+        self.in_flight = in_flight
+        self.drain_timeout = drain_timeout
+        self.stopping = False
+        self._stop_task: Optional[asyncio.Task] = None
+
+    def install_signal_handlers(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            # На Windows обработчики сигналов в цикле событий не поддерживаются
+            with suppress(NotImplementedError):
+                loop.add_signal_handler(sig, self.request_stop, sig)
+
+    def request_stop(self, sig: Optional[signal.Signals] = None) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Received {sig.name if sig else 'stop request'}, stopping polling")
+        self._stop_task = asyncio.create_task(self._stop_polling())
+
+    async def _stop_polling(self) -> None:
+        # Сигнал мог прийти еще до старта polling - тогда он просто не запустится
+        with suppress(RuntimeError):
+            await self.dp.stop_polling()
+
+    async def drain(self) -> int:
+        return await self.in_flight.drain(self.drain_timeout)
@@ -0,0 +1,59 @@
+# bot/utils/startup.py
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Замер длительности этапов запуска"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    async def phase(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        started_at = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.phases[name] = time.perf_counter() - started_at
+
+    def mark(self, name: str, started_at: float) -> None:
+        """Записать длительность синхронного этапа, начатого в started_at"""
+        self.phases[name] = time.perf_counter() - started_at
+
+    def report(self) -> None:
+        total = time.perf_counter() - self.started_at
+        breakdown = ", ".join(f"{name}={duration * 1000:.0f}ms" for name, duration in self.phases.items())
+        logger.info(f"Startup finished in {total * 1000:.0f}ms ({breakdown})")
+
+
+async def gather_or_cancel(*awaitables: Awaitable[Any]) -> List[Any]:
+    """Как asyncio.gather, но при первой ошибке отменяет остальные и дожидается их.
+
+    После выхода ни одна задача уже не работает - код остановки
+    может закрывать общие ресурсы, например пул соединений БД.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def run_event_loop(main: Awaitable[Any]) -> None:
+    """Запустить main на uvloop, если он установлен"""
+    try:
+        import uvloop
+    except ImportError:
+        logger.info("uvloop is not installed, using default asyncio event loop")
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Using uvloop event loop")
+    asyncio.run(main)
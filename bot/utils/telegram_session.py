@@ -0,0 +1,138 @@
+# bot/utils/telegram_session.py
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import (TelegramEntityTooLarge, TelegramNetworkError,
+                                TelegramRetryAfter, TelegramServerError)
+from aiogram.methods import GetUpdates, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+
+class MethodMetrics:
+    """Счетчики и последние задержки запросов одного метода Bot API"""
+
+    __slots__ = ("calls", "errors", "retries", "total_time", "max_time", "latencies")
+
+    def __init__(self, window: int = 512):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.latencies = deque(maxlen=window)
+
+    def observe(self, elapsed: float, failed: bool) -> None:
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.latencies.append(elapsed)
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'avg_ms': round(self.total_time / self.calls * 1000, 1) if self.calls else 0.0,
+            'p95_ms': round(self.percentile(0.95) * 1000, 1),
+            'max_ms': round(self.max_time * 1000, 1),
+        }
+
+
+class TelegramSession(AiohttpSession):
+    """Сессия Bot API с пулом соединений, ограничением параллельности и повторами.
+
+    - pool_size keep-alive соединений к api.telegram.org;
+    - не больше max_concurrency запросов одновременно, остальные ждут в очереди;
+    - 429 повторяется через retry_after (если он не больше max_retry_after),
+      5xx и сетевые ошибки - с экспоненциальной задержкой и случайным разбросом;
+    - задержки и ошибки собираются по каждому методу.
+
+    getUpdates идет в обход очереди и повторов: это долгий запрос,
+    а у polling свой механизм переподключения.
+    """
+
+    def __init__(self, pool_size: int = 100, max_concurrency: int = 50, max_retries: int = 3,
+                 max_retry_after: float = 60, backoff_base: float = 0.5, backoff_max: float = 10,
+                 keepalive_timeout: float = 60, **kwargs):
+        super().__init__(limit=pool_size, **kwargs)
+        self._connector_init["keepalive_timeout"] = keepalive_timeout
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.metrics: Dict[str, MethodMetrics] = {}
+        # Сколько запросов ждут свободного слота
+        self.waiting = 0
+
+    def metrics_summary(self) -> List[dict]:
+        rows = [{'method': name, **metrics.summary()} for name, metrics in self.metrics.items()]
+        return sorted(rows, key=lambda row: row['calls'], reverse=True)
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: Optional[int] = None
+    ) -> TelegramType:
+        if isinstance(method, GetUpdates):
+            return await self._timed_request(bot, method, timeout)
+
+        attempt = 0
+        while True:
+            self.waiting += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+            try:
+                return await self._timed_request(bot, method, timeout)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries or e.retry_after > self.max_retry_after:
+                    raise
+                delay = e.retry_after + random.uniform(0, 1)
+            except (TelegramServerError, TelegramNetworkError) as e:
+                # Слишком большой файл не пройдет и со второй попытки
+                if attempt >= self.max_retries or isinstance(e, TelegramEntityTooLarge):
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.5)
+            finally:
+                self._semaphore.release()
+            attempt += 1
+            self._metrics_for(method).retries += 1
+            logger.warning(
+                f"{method.__api_method__} failed, retry {attempt}/{self.max_retries} in {delay:.1f}s"
+            )
+            # Слот освобожден на время ожидания, чтобы не задерживать другие запросы
+            await asyncio.sleep(delay)
+
+    async def _timed_request(self, bot: Bot, method: TelegramMethod[TelegramType],
+                             timeout: Optional[int]) -> TelegramType:
+        started_at = time.perf_counter()
+        failed = True
+        try:
+            result = await super().make_request(bot, method, timeout)
+            failed = False
+            return result
+        finally:
+            self._metrics_for(method).observe(time.perf_counter() - started_at, failed)
+
+    def _metrics_for(self, method: TelegramMethod) -> MethodMetrics:
+        name = method.__api_method__
+        metrics = self.metrics.get(name)
+        if metrics is None:
+            metrics = self.metrics[name] = MethodMetrics()
+        return metrics
@@ -0,0 +1,253 @@
+# tests/test_database.py
+from datetime import datetime
+
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, BigInteger, String, Text, Boolean, DateTime, ForeignKey,
+    func, select
+)
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from bot.models.database import DatabaseManager, DEFAULT_EVENT_NAME, MATCH_START
+from bot.models.models import Event, Task, UserAttempt
+from bot.services.scoring import ScoringPolicy
+
+# Схема первой версии бота - до мероприятий, счетчика решивших и команд
+legacy = MetaData()
+legacy_tasks = Table(
+    "tasks", legacy,
+    Column("id", Integer, primary_key=True),
+    Column("title", String(255), nullable=False),
+    Column("description", Text, nullable=False),
+    Column("image_url", String(500)),
+    Column("correct_answer", String(500), nullable=False),
+    Column("points", Integer, nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_at", DateTime, server_default=func.now(), nullable=False),
+)
+legacy_users = Table(
+    "users", legacy,
+    Column("id", Integer, primary_key=True),
+    Column("telegram_id", BigInteger, unique=True, nullable=False),
+    Column("username", String(255)),
+    Column("full_name", String(255), nullable=False),
+    Column("score", Integer, nullable=False),
+    Column("current_task_id", Integer, ForeignKey("tasks.id")),
+    Column("can_get_task", Boolean, nullable=False),
+    Column("created_at", DateTime, server_default=func.now(), nullable=False),
+)
+legacy_attempts = Table(
+    "user_attempts", legacy,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("task_id", Integer, ForeignKey("tasks.id"), nullable=False),
+    Column("user_answer", Text, nullable=False),
+    Column("is_correct", Boolean, nullable=False),
+    Column("attempted_at", DateTime, server_default=func.now(), nullable=False),
+)
+
+
+async def create_user(db: DatabaseManager, telegram_id: int, name: str):
+    return await db.get_or_create_user(telegram_id, name.lower(), name)
+
+
+async def test_create_tables_migrates_legacy_schema(database_url):
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(legacy.create_all)
+        await conn.execute(legacy_tasks.insert().values(
+            id=1, title="Старое задание", description="Про кротов", correct_answer="42", points=10, is_active=True
+        ))
+        await conn.execute(legacy_users.insert().values(
+            id=1, telegram_id=1001, username="old", full_name="Old", score=10, can_get_task=True
+        ))
+        await conn.execute(legacy_attempts.insert().values(
+            user_id=1, task_id=1, user_answer="42", is_correct=True
+        ))
+    await engine.dispose()
+
+    db = DatabaseManager(database_url)
+    try:
+        await db.create_tables()
+        # Повторный запуск ничего не меняет
+        await db.create_tables()
+        async with db.async_session() as session:
+            events = (await session.execute(select(Event.id, Event.name, Event.is_active))).all()
+            task = await session.scalar(select(Task).where(Task.id == 1))
+            attempt_events = (await session.scalars(select(UserAttempt.event_id))).all()
+
+        assert events == [(db.active_event_id, DEFAULT_EVENT_NAME, True)]
+        assert task.event_id == db.active_event_id
+        assert task.solve_count == 1
+        assert attempt_events == [db.active_event_id]
+        assert await db.has_user_solved_task(1, 1)
+        rows, total = await db.search_tasks("кротов")
+        assert total == 1 and rows[0].id == 1
+    finally:
+        await db.close()
+
+
+async def test_record_solve_static(db):
+    scoring = ScoringPolicy()
+    task = await db.create_task("Загадка", "Сколько?", None, "42", 10)
+    user = await create_user(db, 2001, "Ann")
+    await db.set_user_current_task(user.telegram_id, task.id)
+
+    assert await db.record_solve(user.id, task.id, "42", scoring) == (10, 10)
+    # Повторный правильный ответ баллов не добавляет
+    assert await db.record_solve(user.id, task.id, "42", scoring) == (0, 10)
+
+    state = db.user_cache.get(user.telegram_id)
+    assert state.current_task_id is None and not state.can_get_task
+    assert (await db.get_task_by_id(task.id)).solve_count == 1
+    assert await db.count_user_solved(user.id) == 1
+
+
+async def test_record_solve_dynamic_rebalances_previous_solvers(db):
+    scoring = ScoringPolicy("dynamic", minimum=50, decay=2)
+    task = await db.create_task("Загадка", "Сколько?", None, "42", 100)
+    team = await db.create_team("Кроты")
+    first = await create_user(db, 2001, "Ann")
+    second = await create_user(db, 2002, "Bob")
+    await db.set_user_team(first.telegram_id, team.id)
+
+    assert await db.record_solve(first.id, task.id, "42", scoring) == (100, 100)
+    awarded, score = await db.record_solve(second.id, task.id, "42", scoring)
+    value = scoring.value(100, 2)
+
+    assert awarded == score == value < 100
+    assert (await db.get_user_by_telegram_id(first.telegram_id)).score == value
+    assert db.team_cache.get(team.id).score == value
+
+
+async def test_search_tasks(db):
+    first = await db.create_task("Кроты в саду", "Найдите всех кротов", None, "a", 10)
+    second = await db.create_task("Сад", "Сколько кротов живет в саду?", None, "b", 10)
+    await db.create_task("Другое", "Ничего общего", None, "c", 10)
+
+    rows, total = await db.search_tasks("крот")
+    assert total == 2
+    # Совпадение в названии выше совпадения в описании
+    assert [row[0] for row in rows] == [first.id, second.id]
+    assert MATCH_START in rows[1][3]
+
+    rows, total = await db.search_tasks("крот", limit=1, offset=1)
+    assert total == 2 and [row[0] for row in rows] == [second.id]
+    assert await db.search_tasks("!!!") == ([], 0)
+
+    await db.soft_delete_task(first.id)
+    rows, total = await db.search_tasks("крот")
+    assert total == 1 and rows[0][0] == second.id
+
+
+async def test_upsert_users(db):
+    states = await db.upsert_users([(3001, "ann", "Ann"), (3002, None, "Bob"), (3001, "ann", "Ann")])
+    assert sorted(states) == [3001, 3002]
+    assert states[3002].username is None and states[3002].score == 0
+
+    await db.update_user_score(3001, 15)
+    # Неизмененный профиль не перезаписывается, но его состояние возвращается
+    states = await db.upsert_users([(3001, "ann", "Ann"), (3002, "bob", "Bob"), (3003, "eve", "Eve")])
+    assert states[3001].score == 15
+    assert states[3002].username == "bob"
+    assert states[3003].id not in (states[3001].id, states[3002].id)
+
+    users = {user.telegram_id: user for user in await db.get_all_users()}
+    assert sorted(users) == [3001, 3002, 3003]
+    assert users[3002].username == "bob" and users[3001].score == 15
+
+
+async def test_switch_event_saves_and_restores_progress(db):
+    scoring = ScoringPolicy()
+    first_event = db.active_event_id
+    team = await db.create_team("Кроты")
+    user = await create_user(db, 4001, "Ann")
+    await db.set_user_team(user.telegram_id, team.id)
+    task = await db.create_task("Первое", "Задание первого мероприятия", None, "a", 10)
+    await db.record_solve(user.id, task.id, "a", scoring)
+
+    second_event = (await db.create_event("Второе")).id
+    assert await db.create_event("Второе") is None
+    result = await db.switch_event(second_event)
+    assert result['saved_users'] == 1 and result['restored_users'] == 0
+
+    state = (await db.upsert_users([(4001, "ann", "Ann")]))[4001]
+    assert state.score == 0 and state.can_get_task
+    assert db.team_cache.get(team.id).score == 0
+    assert await db.get_all_tasks() == []
+    assert await db.search_tasks("первого") == ([], 0)
+    assert not await db.has_user_solved_task(user.id, task.id)
+    assert await db.count_user_solved(user.id) == 0
+
+    assert await db.switch_event(10_000) is None
+    result = await db.switch_event(first_event)
+    assert result['restored_users'] == 1
+    state = (await db.upsert_users([(4001, "ann", "Ann")]))[4001]
+    assert state.score == 10 and not state.can_get_task
+    assert db.team_cache.get(team.id).score == 10
+    assert await db.has_user_solved_task(user.id, task.id)
+    assert [(event_id, is_active) for event_id, _, is_active, _ in await db.get_events()] == [
+        (first_event, True), (second_event, False)
+    ]
+
+
+async def test_export_does_not_block_writers(db):
+    task = await db.create_task("Загадка", "Сколько?", None, "42", 10)
+    user = await create_user(db, 5001, "Ann")
+    await db.insert_attempts([
+        {'event_id': db.active_event_id, 'user_id': user.id, 'task_id': task.id,
+         'user_answer': str(i), 'is_correct': False}
+        for i in range(2000)
+    ])
+
+    exported = 0
+    async for partition in db.stream_attempts_export(partition_size=100):
+        if not exported:
+            # Ответ игрока во время выгрузки записывается, а не падает с "database is locked"
+            await db.record_solve(user.id, task.id, "42", ScoringPolicy())
+        exported += len(partition)
+    assert exported >= 2000
+    assert await db.count_user_solved(user.id) == 1
+
+
+async def test_archived_attempt_ids_are_not_reused(db):
+    scoring = ScoringPolicy()
+    task = await db.create_task("Загадка", "Сколько?", None, "42", 10)
+    user = await create_user(db, 6001, "Ann")
+    attempts = [await db.create_attempt(user.id, task.id, answer, False) for answer in ("1", "2", "3")]
+
+    max_id = await db.get_archive_boundary(datetime.max)
+    assert await db.archive_attempts_chunk(0, max_id, 100) == (3, max_id)
+    # Последние строки ушли в архив, но их id не выдаются новым попыткам
+    fresh = await db.create_attempt(user.id, task.id, "4", False)
+    assert fresh.id > max_id
+
+    # Ответ изменился на "1": архивная попытка возвращается в горячую таблицу
+    result = await db.apply_regrade(task.id, [attempts[0].id], [], scoring)
+    assert result['gained'] == [user.id]
+    assert await db.has_user_solved_task(user.id, task.id)
+
+
+async def test_points_edit_rebalances_solvers(db):
+    scoring = ScoringPolicy("dynamic", minimum=50, decay=5)
+    task = await db.create_task("Загадка", "Сколько?", None, "42", 100)
+    team = await db.create_team("Кроты")
+    first = await create_user(db, 7001, "Ann")
+    second = await create_user(db, 7002, "Bob")
+    await db.set_user_team(first.telegram_id, team.id)
+    await db.record_solve(first.id, task.id, "42", scoring)
+    await db.record_solve(second.id, task.id, "42", scoring)
+
+    await db.update_task(task.id, scoring, points=200)
+    assert db.user_cache.get(first.telegram_id).score == scoring.value(200, 2)
+    assert db.team_cache.get(team.id).score == scoring.value(200, 2)
+
+    # Следующие решения и перепроверка считают разницу уже от новой стоимости
+    third = await create_user(db, 7003, "Eve")
+    await db.record_solve(third.id, task.id, "42", scoring)
+    users = {user.telegram_id: user.score for user in await db.get_all_users()}
+    assert set(users.values()) == {scoring.value(200, 3)}
+
+    result = await db.apply_regrade(task.id, [], [], scoring)
+    assert result['solve_count'] == 3
+    users = {user.telegram_id: user.score for user in await db.get_all_users()}
+    assert set(users.values()) == {scoring.value(200, 3)}
@@ -0,0 +1,88 @@
+# tests/test_dedup.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiogram.types import Update
+
+from bot.middlewares.dedup import DeduplicationMiddleware, UpdateWatermark
+
+BOT = SimpleNamespace(id=1)
+
+
+def make_middleware(tmp_path) -> DeduplicationMiddleware:
+    return DeduplicationMiddleware(str(tmp_path), content_window=0)
+
+
+async def dispatch(middleware: DeduplicationMiddleware, update_id: int, handler=None):
+    async def ok(event, data):
+        return "handled"
+    return await middleware(handler or ok, Update(update_id=update_id), {"bot": BOT})
+
+
+def restart(middleware: DeduplicationMiddleware, tmp_path) -> DeduplicationMiddleware:
+    middleware.flush()
+    return make_middleware(tmp_path)
+
+
+async def test_failed_update_is_redelivered_after_restart(tmp_path):
+    middleware = make_middleware(tmp_path)
+
+    async def fail(event, data):
+        raise RuntimeError("handler failed")
+
+    assert await dispatch(middleware, 10) == "handled"
+    with pytest.raises(RuntimeError):
+        await dispatch(middleware, 11, fail)
+    assert await dispatch(middleware, 12) == "handled"
+
+    middleware = restart(middleware, tmp_path)
+    # Telegram повторяет последнюю пачку: 10 и 12 уже обработаны, 11 - нет
+    assert middleware.watermark.value == 10
+    assert await dispatch(middleware, 10) is None
+    assert await dispatch(middleware, 11) == "handled"
+    assert await dispatch(middleware, 12) is None
+    assert middleware.watermark.value == 12 and not middleware.watermark.done
+
+
+async def test_watermark_waits_for_running_lower_update(tmp_path):
+    middleware = make_middleware(tmp_path)
+    release = asyncio.Event()
+
+    async def slow(event, data):
+        await release.wait()
+        return "handled"
+
+    running = asyncio.create_task(dispatch(middleware, 20, slow))
+    await asyncio.sleep(0)
+    assert await dispatch(middleware, 21) == "handled"
+    assert middleware.watermark.value == 0 and middleware.watermark.done == {21}
+
+    release.set()
+    assert await running == "handled"
+    assert middleware.watermark.value == 21
+
+
+def test_corrupted_watermark_is_ignored(tmp_path):
+    (tmp_path / "dedup_watermark").write_text("1 not-a-number 0")
+    assert UpdateWatermark(tmp_path / "dedup_watermark", max_age=60).value == 0
+
+
+async def test_cancelled_update_is_redelivered_after_restart(tmp_path):
+    middleware = make_middleware(tmp_path)
+    middleware.watermark.retry_window = 0
+
+    async def stuck(event, data):
+        await asyncio.Event().wait()
+
+    running = asyncio.create_task(dispatch(middleware, 30, stuck))
+    await asyncio.sleep(0)
+    assert await dispatch(middleware, 31) == "handled"
+    # Так отменяет зависшие обработчики InFlightMiddleware.drain
+    running.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await running
+
+    middleware = restart(middleware, tmp_path)
+    assert await dispatch(middleware, 30) == "handled"
+    assert await dispatch(middleware, 31) is None
@@ -0,0 +1,31 @@
+# tests/test_startup.py
+import asyncio
+
+import pytest
+
+from bot.utils.startup import gather_or_cancel
+
+
+async def test_gather_or_cancel_stops_siblings_on_error():
+    finished = asyncio.Event()
+
+    async def slow_init():
+        await asyncio.sleep(10)
+        finished.set()
+
+    async def failing_check():
+        raise RuntimeError("invalid token")
+
+    sibling = asyncio.ensure_future(slow_init())
+    with pytest.raises(RuntimeError, match="invalid token"):
+        await gather_or_cancel(failing_check(), sibling)
+    # К выходу инициализация уже отменена, а не продолжает работать с БД
+    assert sibling.cancelled() and not finished.is_set()
+
+
+async def test_gather_or_cancel_returns_results():
+    async def value(result):
+        await asyncio.sleep(0)
+        return result
+
+    assert await gather_or_cancel(value(1), value(2)) == [1, 2]